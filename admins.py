@@ -0,0 +1,53 @@
+from aiogram.dispatcher.filters import BoundFilter
+from cache import TTLCache
+from database import get_admin_ids, add_admins
+
+
+# === Adminlar ro‘yxati (bazada, jarayon ichida keshlangan) ===
+# Har bir jarayon ro‘yxatni `ttl` soniyada bir marta qayta o‘qiydi, shuning
+# uchun boshqa workerda qo‘shilgan admin ko‘pi bilan shuncha vaqtda ko‘rinadi.
+class AdminStore:
+    def __init__(self, seed=(), ttl=60):
+        self.seed = tuple(seed)
+        self._cache = TTLCache(maxsize=1, ttl=ttl)
+
+    async def warmup(self):
+        await add_admins(self.seed)
+        await self.get_all()
+
+    async def _load(self):
+        return frozenset(await get_admin_ids())
+
+    async def get_all(self):
+        return await self._cache.get_or_load("admins", self._load)
+
+    async def contains(self, user_id):
+        return user_id in await self.get_all()
+
+    # Yangi admin qo‘shilgan bo‘lsa True
+    async def add(self, user_id, added_by=None):
+        added = await add_admins([user_id], added_by) > 0
+        self._cache.invalidate("admins")
+        return added
+
+
+# === is_admin=True filtri ===
+# IDFilter ro‘yxatni ro‘yxatdan o‘tkazishda nusxalaydi, keyin qo‘shilgan
+# adminlarni ko‘rmaydi; bu filtr har safar AdminStore dan tekshiradi.
+class IsAdmin(BoundFilter):
+    key = "is_admin"
+    store = None
+
+    def __init__(self, is_admin):
+        self.is_admin = is_admin
+
+    async def check(self, obj):
+        user = getattr(obj, "from_user", None)
+        if user is None:
+            return False
+        return await self.store.contains(user.id) == self.is_admin
+
+
+def setup_admin_filter(dp, store):
+    IsAdmin.store = store
+    dp.filters_factory.bind(IsAdmin)
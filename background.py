@@ -0,0 +1,57 @@
+import abc
+import asyncio
+
+
+# === Davriy flush qiluvchi asos ===
+# Xotirada yig‘ilgan yozuvlarni har `interval` soniyada (yoki wake() chaqirilganda
+# darhol) bazaga yozadi, stop() esa oxirgi marta flush qiladi. Vazifa bekor
+# qilinmaydi: stop() tsiklga to‘xtash belgisini beradi va boshlangan flush
+# tugashini kutadi — aks holda almashtirib olingan bufer yo‘qolib qoladi.
+class PeriodicFlusher(abc.ABC):
+    # Yig‘ilgan ma'lumot bo‘lmagan davriy vazifalar uchun False
+    flush_on_stop = True
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._task = None
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+
+    @abc.abstractmethod
+    async def flush(self):
+        pass
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                return
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ {type(self).__name__} flush xatosi: {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        if not self.flush_on_stop:
+            return
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"❌ {type(self).__name__} yakuniy flush xatosi: {e}")
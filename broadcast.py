@@ -0,0 +1,141 @@
+import asyncio
+import time
+from aiogram.utils.exceptions import MessageNotModified
+from ratelimit import TokenBucket
+from outbound import current_priority, BULK
+from database import (
+    iter_user_id_batches,
+    create_broadcast,
+    get_broadcast,
+    get_running_broadcasts,
+    save_broadcast_progress
+)
+
+# Admin uchun holat xabari necha soniyada yangilanadi
+PROGRESS_INTERVAL = 5
+
+
+# === Ommaviy xabar yuborish ===
+# Foydalanuvchilar user_id tartibida oqim sifatida o‘qiladi, har bir sahifa
+# bir vaqtda (token bucket bilan cheklangan holda) yuboriladi va sahifa
+# tugagach jarayon holati bazaga yoziladi. Qayta ishga tushganda "running"
+# holatidagi jarayonlar oxirgi saqlangan joydan davom etadi. RetryAfter va
+# qayta urinishlar outbound rejalashtiruvchisida — bu yerda faqat tezlik cheklanadi.
+class Broadcaster:
+    def __init__(self, bot, rate=25, concurrency=20, page_size=500):
+        self.bot = bot
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self._tasks = set()
+
+    def _spawn(self, job):
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def start(self, admin_chat_id, from_chat, message_id):
+        broadcast_id = await create_broadcast(admin_chat_id, from_chat, message_id)
+        self._spawn(await get_broadcast(broadcast_id))
+        return broadcast_id
+
+    # Ishga tushishda tugallanmagan jarayonlarni davom ettirish
+    async def resume(self):
+        for job in await get_running_broadcasts():
+            self._spawn(job)
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _send(self, semaphore, user_id, from_chat, message_id):
+        async with semaphore:
+            await self.bucket.acquire()
+            try:
+                await self.bot.forward_message(
+                    chat_id=user_id,
+                    from_chat_id=from_chat,
+                    message_id=message_id
+                )
+                return True
+            except Exception as e:
+                print(f"Xatolik {user_id} uchun: {e}")
+                return False
+
+    async def _report(self, job, status_message, text):
+        try:
+            if status_message is None:
+                return await self.bot.send_message(job["admin_chat_id"], text)
+            await self.bot.edit_message_text(text, job["admin_chat_id"], status_message.message_id)
+        except MessageNotModified:
+            pass
+        except Exception as e:
+            print(f"❌ Broadcast holatini yuborib bo‘lmadi: {e}")
+        return status_message
+
+    @staticmethod
+    def _progress_text(job_id, success, fail, rate, finished=False):
+        title = "✅ Yuborish tugadi" if finished else "📨 Yuborilmoqda..."
+        return (
+            f"{title} (#{job_id})\n\n"
+            f"✅ Yuborildi: {success} ta\n"
+            f"❌ Xatolik: {fail} ta\n"
+            f"⚡️ Tezlik: {rate:.1f} ta/s"
+        )
+
+    async def _run(self, job):
+        # Ommaviy yuborish: foydalanuvchilarga javoblardan keyin navbat oladi
+        current_priority.set(BULK)
+        job_id = job["id"]
+        last_user_id = job["last_user_id"]
+        success, fail = job["success"], job["fail"]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        started = time.monotonic()
+        sent = 0
+        status_message = await self._report(job, None, self._progress_text(job_id, success, fail, 0))
+        last_report = started
+
+        try:
+            # Botni bloklagan / o‘chgan foydalanuvchilar o‘tkazib yuboriladi
+            async for user_ids in iter_user_id_batches(last_user_id, self.page_size, active_only=True):
+                results = await asyncio.gather(*(
+                    self._send(semaphore, user_id, job["from_chat"], job["message_id"])
+                    for user_id in user_ids
+                ))
+                ok = sum(results)
+                success += ok
+                fail += len(results) - ok
+                sent += len(results)
+                last_user_id = user_ids[-1]
+                await save_broadcast_progress(job_id, last_user_id, success, fail)
+
+                now = time.monotonic()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    rate = sent / (now - started)
+                    status_message = await self._report(
+                        job, status_message, self._progress_text(job_id, success, fail, rate)
+                    )
+                    last_report = now
+
+            await save_broadcast_progress(job_id, last_user_id, success, fail, status="done")
+        except Exception as e:
+            # Bekor qilish (to‘xtash) bu yerga tushmaydi — "running" qoladi va qayta tiklanadi
+            print(f"❌ Broadcast #{job_id} xatolik bilan to‘xtadi: {e}")
+            try:
+                await save_broadcast_progress(job_id, last_user_id, success, fail, status="failed")
+            except Exception as save_error:
+                print(f"❌ Broadcast #{job_id} holatini saqlab bo‘lmadi: {save_error}")
+            await self._report(
+                job, None,
+                f"❌ Yuborish xatolik bilan to‘xtadi (#{job_id}): {e}\n\n"
+                f"✅ Yuborildi: {success} ta\n"
+                f"❌ Xatolik: {fail} ta"
+            )
+            return
+
+        rate = sent / max(time.monotonic() - started, 1e-9)
+        status_message = await self._report(
+            job, status_message, self._progress_text(job_id, success, fail, rate, finished=True)
+        )
@@ -0,0 +1,98 @@
+import asyncio
+from aiogram.utils.exceptions import RetryAfter, BotBlocked, ChatNotFound, UserDeactivated
+from aiogram.utils.payload import prepare_arg
+from ratelimit import TokenBucket
+from outbound import current_priority, BULK
+
+# Bot API: bitta copyMessages so‘rovida ko‘pi bilan 100 ta xabar
+MAX_BATCH = 100
+# Foydalanuvchiga umuman yetkazib bo‘lmaydi — qolganini yuborishning ma'nosi yo‘q
+FATAL_ERRORS = (BotBlocked, UserDeactivated)
+# Qayta urinishdan foyda yo‘q: "chat not found" manba kanal noto‘g‘ri bo‘lganda
+# ham qaytadi, shuning uchun faqat shu paket yuborilmagan hisoblanadi
+BATCH_ERRORS = (ChatNotFound,)
+
+
+# === Barcha qismlarni yuborish ===
+# Qismlar copyMessages bilan `batch_size` tadan yuboriladi: bitta so‘rov —
+# bir nechta xabar, tartib Telegram tomonida saqlanadi (alohida parallel
+# copyMessage larda tartib kafolatlanmaydi). Har bir chat uchun token bucket
+# (rate xabar/s) ishlatiladi; RetryAfter outbound rejalashtiruvchisida qayta
+# urinib ko‘riladi, bu yerga yetib kelsa paket yuborilmagan hisoblanadi.
+# Bitta foydalanuvchining ikkinchi ommaviy
+# so‘rovi birinchisi tugamaguncha qabul qilinmaydi.
+class EpisodeBatchSender:
+    def __init__(self, bot, chat_rate=1.0, chat_burst=10, batch_size=10, max_attempts=3):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.batch_size = min(batch_size, MAX_BATCH)
+        self.max_attempts = max_attempts
+        self._active = {}
+
+    def is_running(self, user_id):
+        return user_id in self._active
+
+    # on_done(sent, failed) oxirida bir marta chaqiriladi; False — allaqachon ishlayapti
+    def start(self, user_id, from_chat, message_ids, on_done):
+        if user_id in self._active:
+            return False
+        task = asyncio.create_task(self._run(user_id, from_chat, message_ids, on_done))
+        self._active[user_id] = task
+        task.add_done_callback(lambda _: self._active.pop(user_id, None))
+        return True
+
+    async def stop(self):
+        tasks = list(self._active.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _copy_batch(self, user_id, from_chat, message_ids):
+        result = await self.bot.request("copyMessages", {
+            "chat_id": user_id,
+            "from_chat_id": from_chat,
+            "message_ids": prepare_arg(message_ids)
+        })
+        # Topilmagan / nusxalab bo‘lmaydigan xabarlar javobda bo‘lmaydi
+        return len(result)
+
+    async def _run(self, user_id, from_chat, message_ids, on_done):
+        current_priority.set(BULK)
+        bucket = TokenBucket(self.chat_rate, self.chat_burst)
+        sent = 0
+        failed = 0
+        for start in range(0, len(message_ids), self.batch_size):
+            batch = message_ids[start:start + self.batch_size]
+            attempt = 0
+            while True:
+                await bucket.acquire(len(batch))
+                attempt += 1
+                try:
+                    copied = await self._copy_batch(user_id, from_chat, batch)
+                except (RetryAfter, *BATCH_ERRORS) as e:
+                    print(f"❌ Qismlarni yuborishda xatolik: {user_id} -> {e}")
+                    copied = 0
+                except FATAL_ERRORS:
+                    # Qolgan qismlar ham yuborilmagan hisoblanadi, hisobot baribir chaqiriladi
+                    failed += len(message_ids) - start
+                    await self._report(on_done, user_id, sent, failed)
+                    return
+                except Exception as e:
+                    if attempt < self.max_attempts:
+                        await asyncio.sleep(2 ** (attempt - 1))
+                        continue
+                    print(f"❌ Qismlarni yuborishda xatolik: {user_id} -> {e}")
+                    copied = 0
+                sent += copied
+                failed += len(batch) - copied
+                break
+
+        await self._report(on_done, user_id, sent, failed)
+
+    @staticmethod
+    async def _report(on_done, user_id, sent, failed):
+        try:
+            await on_done(sent, failed)
+        except Exception as e:
+            print(f"❌ Yakuniy hisobotni yuborib bo‘lmadi: {user_id} -> {e}")
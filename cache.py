@@ -0,0 +1,110 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+# Yuklovchi bekor qilinganda kutayotganlarga "qayta urinib ko‘ring" belgisi
+_RETRY = object()
+
+
+# === LRU + TTL kesh ===
+# Bir xil kalit uchun bir vaqtda kelgan so‘rovlar bitta yuklashni
+# kutadi (single-flight), "topilmadi" (None) natijasi ham keshlanadi.
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _lookup(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return False, None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def get(self, key, default=None):
+        found, value = self._lookup(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, *keys):
+        for key in keys:
+            self._data.pop(key, None)
+            # Yuklanayotgan eski qiymat keshga yozilmasligi uchun
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self._inflight.clear()
+
+    async def get_or_load(self, key, loader):
+        while True:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self.coalesced += 1
+            value = await asyncio.shield(future)
+            # Yuklayotgan vazifa bekor qilindi — kutayotganlar o‘zi qayta yuklaydi
+            if value is not _RETRY:
+                return value
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            future.set_result(_RETRY)
+            raise
+        except Exception as e:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            future.set_exception(e)
+            # Kutayotganlar bo‘lmasa ham "never retrieved" ogohlantirishi chiqmasin
+            future.exception()
+            raise
+
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+            self.set(key, value)
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        total = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / total if total else 0.0,
+        }
@@ -0,0 +1,87 @@
+import csv
+import io
+import time
+from database import add_kino_codes_batch
+
+# Ustunlar tartibi matnli formatdagi bilan bir xil
+COLUMNS = ("KOD", "@kanal", "REKLAMA_ID", "POST_SONI", "ANIME_NOMI")
+MAX_CODE_LENGTH = 32
+
+
+# === Bitta qatorni tekshirish ===
+# (code, channel, reklama_id, post_count, title) yoki xato matnini qaytaradi
+def parse_fields(fields):
+    fields = [field.strip() for field in fields]
+    if len(fields) < 5:
+        return None, f"{len(COLUMNS)} ta ustun kerak ({' '.join(COLUMNS)})"
+
+    code, channel, reklama_id, post_count = fields[:4]
+    title = " ".join(field for field in fields[4:] if field)
+
+    if not code.isdigit() or len(code) > MAX_CODE_LENGTH:
+        return None, f"kod noto‘g‘ri: {code!r}"
+    if not channel:
+        return None, "kanal ko‘rsatilmagan"
+    if not reklama_id.isdigit():
+        return None, f"REKLAMA_ID raqam emas: {reklama_id!r}"
+    if not post_count.isdigit() or int(post_count) == 0:
+        return None, f"POST_SONI noto‘g‘ri: {post_count!r}"
+    if not title:
+        return None, "anime nomi yo‘q"
+    return (code, channel, int(reklama_id), int(post_count), title), None
+
+
+def _detect_delimiter(filename, sample):
+    if filename and filename.lower().endswith(".tsv"):
+        return "\t"
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t").delimiter
+    except csv.Error:
+        return ","
+
+
+# === CSV/TSV faylni import qilish ===
+# Fayl qatorma-qator o‘qiladi, to‘g‘ri qatorlar `chunk_size` tadan bitta
+# tranzaksiyada yoziladi. Natija: (qo‘shilgan qatorlar, [(qator, xato)], soniya);
+# qatorlar bazadagi ko‘rinishda — (code, channel, message_id, post_count, title)
+async def import_catalog(data, filename=None, chunk_size=500):
+    started = time.monotonic()
+    text = io.TextIOWrapper(data, encoding="utf-8-sig", errors="replace", newline="")
+    delimiter = _detect_delimiter(filename, text.read(4096))
+    text.seek(0)
+
+    imported = []
+    errors = []
+    chunk = []
+    chunk_lines = []
+
+    async def write_chunk():
+        try:
+            await add_kino_codes_batch(chunk)
+            imported.extend(chunk)
+        except Exception as e:
+            errors.extend((line_no, f"bazaga yozilmadi: {e}") for line_no in chunk_lines)
+        chunk.clear()
+        chunk_lines.clear()
+
+    for line_no, fields in enumerate(csv.reader(text, delimiter=delimiter), start=1):
+        if not any(field.strip() for field in fields):
+            continue
+        row, error = parse_fields(fields)
+        if error:
+            # Birinchi qator sarlavha bo‘lishi mumkin
+            if line_no == 1 and not fields[0].strip().isdigit():
+                continue
+            errors.append((line_no, error))
+            continue
+
+        code, channel, reklama_id, post_count, title = row
+        chunk.append((code, channel, reklama_id + 1, post_count, title))
+        chunk_lines.append(line_no)
+        if len(chunk) >= chunk_size:
+            await write_chunk()
+
+    if chunk:
+        await write_chunk()
+    text.detach()
+    return imported, errors, time.monotonic() - started
@@ -0,0 +1,51 @@
+import asyncio
+import search
+from background import PeriodicFlusher
+from database import (
+    get_db_catalog_version, reset_catalog_cache, get_all_codes,
+    get_catalog_version, local_catalog_versions
+)
+
+# Oraliq bundan katta bo‘lsa versiyalar birma-bir tekshirilmaydi — to‘liq qayta yuklanadi
+MAX_VERSION_GAP = 1000
+
+
+# === Katalog versiyasini kuzatish (worker rejimi) ===
+# Har bir jarayonda kod keshi va qidiruv indeksi alohida. Katalogni o‘zgartiruvchi
+# so‘rovlar catalog_state dagi versiyani oshiradi; bu yerda u davriy o‘qiladi
+# va o‘zgargan bo‘lsa mahalliy keshlar tozalanib, indeks qayta yuklanadi.
+# Shu jarayonning o‘zi yozgan versiyalar (keshlar allaqachon yangilangan)
+# o‘tkazib yuboriladi; indeks event loop dan tashqarida quriladi.
+class CatalogSync(PeriodicFlusher):
+    flush_on_stop = False
+
+    def __init__(self, interval=5):
+        super().__init__(interval)
+        self.version = None
+
+    async def warmup(self):
+        self.version = await get_db_catalog_version()
+
+    def _only_local(self, version):
+        if self.version is None or not 0 < version - self.version <= MAX_VERSION_GAP:
+            return False
+        return all(v in local_catalog_versions for v in range(self.version + 1, version + 1))
+
+    async def flush(self):
+        version = await get_db_catalog_version()
+        if version == self.version:
+            return
+        only_local = self._only_local(version)
+        local_catalog_versions.difference_update([v for v in local_catalog_versions if v <= version])
+        self.version = version
+        if only_local:
+            return
+
+        reset_catalog_cache()
+        local = get_catalog_version()
+        rows = await get_all_codes()
+        search.index = await asyncio.to_thread(search.build_index, rows)
+        # Qurish paytida shu jarayonda katalog o‘zgardi — yangi indeksda yo‘q,
+        # keyingi safar yana qayta yuklanadi
+        if get_catalog_version() != local:
+            self.version = None
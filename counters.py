@@ -0,0 +1,64 @@
+from datetime import datetime
+from background import PeriodicFlusher
+from database import add_stats_batch, add_hourly_stats_batch
+
+
+def current_hour():
+    return datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+
+# === Statistika hisoblagichi (write-behind) ===
+# searched/viewed o‘sishlari kod bo‘yicha, soatlik o‘sishlar esa (soat, kod)
+# bo‘yicha xotirada yig‘iladi va davriy ravishda ko‘p qatorli
+# INSERT ... ON DUPLICATE KEY UPDATE bilan yoziladi.
+# Yo‘qotish ko‘pi bilan bitta interval yoki max_pending ta kod bilan cheklanadi.
+class StatCounter(PeriodicFlusher):
+    def __init__(self, interval=5, max_pending=1000):
+        super().__init__(interval)
+        self.max_pending = max_pending
+        self._lifetime = {}
+        self._hourly = {}
+
+    def add(self, code, searched=0, viewed=0, episodes=0):
+        if searched or viewed:
+            self._add_lifetime(code, searched, viewed)
+        self._add_hourly((current_hour(), code), searched, viewed, episodes)
+        if len(self._hourly) >= self.max_pending:
+            self.wake()
+
+    def _add_lifetime(self, code, searched, viewed):
+        row = self._lifetime.get(code)
+        if row is None:
+            row = self._lifetime[code] = [0, 0]
+        row[0] += searched
+        row[1] += viewed
+
+    def _add_hourly(self, key, searched, viewed, episodes):
+        row = self._hourly.get(key)
+        if row is None:
+            row = self._hourly[key] = [0, 0, 0]
+        row[0] += searched
+        row[1] += viewed
+        row[2] += episodes
+
+    async def flush(self):
+        # Ikkala jadval alohida: biri yozilmasa faqat o‘sha qism qaytariladi
+        if self._lifetime:
+            lifetime, self._lifetime = self._lifetime, {}
+            try:
+                await add_stats_batch([(code, s, v) for code, (s, v) in lifetime.items()])
+            except Exception:
+                for code, (s, v) in lifetime.items():
+                    self._add_lifetime(code, s, v)
+                raise
+
+        if self._hourly:
+            hourly, self._hourly = self._hourly, {}
+            try:
+                await add_hourly_stats_batch([
+                    (hour, code, s, v, e) for (hour, code), (s, v, e) in hourly.items()
+                ])
+            except Exception:
+                for key, (s, v, e) in hourly.items():
+                    self._add_hourly(key, s, v, e)
+                raise
@@ -0,0 +1,36 @@
+import asyncio
+import time
+from cache import TTLCache
+from database import get_code_count, get_user_counts, get_stat_totals, get_top_codes
+
+
+# === Statistika paneli ===
+# Agregat so‘rovlar bir vaqtda bajariladi va natija qisqa muddat keshlanadi,
+# shuning uchun ketma-ket bosishlar jadvallarni qayta skanerlamaydi.
+class Dashboard:
+    def __init__(self, ttl=30, top_n=10):
+        self.top_n = top_n
+        self._cache = TTLCache(maxsize=1, ttl=ttl)
+
+    async def get(self):
+        return await self._cache.get_or_load("dashboard", self._compute)
+
+    def invalidate(self):
+        self._cache.clear()
+
+    async def _compute(self):
+        codes, (users, inactive_users), (searched, viewed), top = await asyncio.gather(
+            get_code_count(),
+            get_user_counts(),
+            get_stat_totals(),
+            get_top_codes(self.top_n)
+        )
+        return {
+            "codes": codes,
+            "users": users,
+            "inactive_users": inactive_users,
+            "searched": searched,
+            "viewed": viewed,
+            "top": top,
+            "computed_at": time.time(),
+        }
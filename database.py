@@ -1,14 +1,187 @@
 import aiomysql
+import asyncio
+import functools
 import os
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from cache import TTLCache
+from metrics import Counter, Gauge, Histogram, timed_query
+from migrations import migrate
+import search
 
 load_dotenv()
 
 db_pool = None
 
+# === Pool sozlamalari ===
+# minsize ta ulanish pool yaratilganda ochiladi (oldindan isitish).
+# pool_recycle MySQL wait_timeout dan kichik bo‘lishi kerak: eski ulanishlar
+# so‘rovda uzilmasdan oldin yopiladi.
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 5))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 20))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 3600))
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", 5))
+# Bo‘sh ulanish shuncha soniyada topilmasa DatabaseBusy
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", 5))
+# Navbatda shundan ko‘p kutayotgan bo‘lsa yangi so‘rov darhol rad etiladi
+DB_MAX_WAITERS = int(os.getenv("DB_MAX_WAITERS", 200))
+DB_QUERY_RETRIES = int(os.getenv("DB_QUERY_RETRIES", 2))
+
+# Server gone away / lost connection / out of sync — qayta ulanib takrorlanadi
+TRANSIENT_ERROR_CODES = {2006, 2013, 2055}
+
+
+# Pool band: so‘rov navbatga qo‘yilmaydi, chaqiruvchi darhol xato oladi
+class DatabaseBusy(Exception):
+    pass
+
+
+_waiting = 0
+acquire_wait_seconds = Histogram("bot_db_acquire_wait_seconds", "Pooldan ulanish kutish vaqti")
+acquire_rejected = Counter("bot_db_acquire_rejected_total", "Pool band bo‘lgani uchun rad etilganlar", ("reason",))
+db_query_retries = Counter("bot_db_query_retries_total", "Uzilishdan keyin takrorlangan so‘rovlar", ("query",))
+Gauge("bot_db_acquire_waiting", "Pooldan ulanish kutayotganlar", function=lambda: _waiting)
+
+
+def _is_transient(error):
+    if isinstance(error, aiomysql.InterfaceError):
+        return True
+    return (
+        isinstance(error, aiomysql.OperationalError)
+        and bool(error.args) and error.args[0] in TRANSIENT_ERROR_CODES
+    )
+
+
+# === Pooldan ulanish olish (timeout va backpressure bilan) ===
+@asynccontextmanager
+async def acquire():
+    global _waiting
+    if _waiting >= DB_MAX_WAITERS:
+        acquire_rejected.inc("overload")
+        raise DatabaseBusy(f"DB pool band: {_waiting} ta so‘rov kutmoqda")
+
+    started = time.perf_counter()
+    _waiting += 1
+    try:
+        conn = await asyncio.wait_for(db_pool.acquire(), DB_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        acquire_rejected.inc("timeout")
+        raise DatabaseBusy(f"DB pooldan {DB_ACQUIRE_TIMEOUT} s ichida ulanish olinmadi") from None
+    finally:
+        _waiting -= 1
+        acquire_wait_seconds.observe(time.perf_counter() - started)
+
+    try:
+        yield conn
+    except Exception as e:
+        # Uzilgan ulanish poolga qaytmasin
+        if _is_transient(e) and not conn.closed:
+            conn.close()
+        raise
+    finally:
+        await db_pool.release(conn)
+
+
+# === So‘rov funksiyalari uchun dekorator ===
+# Vaqtni o‘lchaydi va uzilishda (yangi ulanish bilan) qayta urinadi.
+# Qayta bajarilsa natija o‘zgaradigan (qo‘shib boradigan) funksiyalar retry=False.
+def query(func=None, *, retry=True):
+    if func is None:
+        return functools.partial(query, retry=retry)
+    timed = timed_query(func)
+    if not retry:
+        return timed
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return await timed(*args, **kwargs)
+            except Exception as e:
+                if attempt >= DB_QUERY_RETRIES or not _is_transient(e):
+                    raise
+                attempt += 1
+                db_query_retries.inc(func.__name__)
+                print(f"⚠️ {func.__name__}: ulanish uzildi ({e}), qayta urinish {attempt}")
+                await asyncio.sleep(0.05 * 2 ** attempt)
+
+    return wrapper
+
+# Katalog (kino_codes) har o‘zgarganda oshadi — sahifalar keshi kaliti uchun
+catalog_version = 0
+
+# Kod bo‘yicha qidiruvlar uchun kesh ("topilmadi" natijasi ham saqlanadi)
+kino_cache = TTLCache(
+    maxsize=int(os.getenv("KINO_CACHE_SIZE", 5000)),
+    ttl=float(os.getenv("KINO_CACHE_TTL", 300))
+)
+
+# Bazadagi katalog versiyasining shu jarayonga ma'lum oxirgi qiymati (None — hali
+# o‘qilmagan). Imzolangan qism tugmalari shu versiya bilan belgilanadi.
+db_catalog_version = None
+
+# Shu jarayonning o‘zi yozgan versiyalar — CatalogSync ularni qayta yuklamaydi
+local_catalog_versions = set()
+
+def _known_db_catalog_version(version):
+    global db_catalog_version
+    if version is not None and (db_catalog_version is None or version > db_catalog_version):
+        db_catalog_version = version
+
+# === Katalog o‘zgarganda keshlarni eskirtirish ===
+def _catalog_changed(*codes, version=None):
+    global catalog_version
+    kino_cache.invalidate(*(str(code) for code in codes))
+    catalog_version += 1
+    if version is not None:
+        # CatalogSync ishlamaydigan (bitta jarayonli) rejimda cheksiz o‘smasin
+        if len(local_catalog_versions) >= 10000:
+            local_catalog_versions.clear()
+        local_catalog_versions.add(version)
+    _known_db_catalog_version(version)
+
+def get_catalog_version():
+    return catalog_version
+
+def get_known_db_catalog_version():
+    return db_catalog_version
+
+# Boshqa jarayon katalogni o‘zgartirganda: butun kod keshi tozalanadi
+def reset_catalog_cache():
+    global catalog_version
+    kino_cache.clear()
+    catalog_version += 1
+
+# Umumiy (bazadagi) katalog versiyasi — har bir yozuvchi so‘rov bilan birga oshiriladi.
+# LAST_INSERT_ID(expr) yangi qiymatni qo‘shimcha SELECT siz qaytaradi.
+async def _bump_db_catalog_version(cur):
+    await cur.execute("UPDATE catalog_state SET version = LAST_INSERT_ID(version + 1) WHERE id = 1")
+    return cur.lastrowid
+
+@query
+async def get_db_catalog_version():
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT version FROM catalog_state WHERE id = 1")
+            row = await cur.fetchone()
+            version = row[0] if row else 0
+            _known_db_catalog_version(version)
+            return version
+
+# Pool to‘lganligi: size — ochiq ulanishlar, freesize — bo‘shlari
+Gauge("bot_db_pool_size", "Pooldagi ochiq ulanishlar", function=lambda: db_pool.size if db_pool else None)
+Gauge("bot_db_pool_free", "Pooldagi bo‘sh ulanishlar", function=lambda: db_pool.freesize if db_pool else None)
+Gauge("bot_db_pool_max", "Pool chegarasi", function=lambda: db_pool.maxsize if db_pool else None)
+
 async def init_db():
     global db_pool
     db_pool = await aiomysql.create_pool(
+        minsize=DB_POOL_MIN,
+        maxsize=DB_POOL_MAX,
+        pool_recycle=DB_POOL_RECYCLE,
+        connect_timeout=DB_CONNECT_TIMEOUT,
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASS"),
         db=os.getenv("DB_NAME"),
@@ -17,81 +190,146 @@ async def init_db():
         autocommit=True  # MySQL uchun kerak
     )
 
-    async with db_pool.acquire() as conn:
-        async with conn.cursor() as cur:
-            # Foydalanuvchilar jadvali
-            await cur.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id BIGINT PRIMARY KEY
-                )
-            """)
+    # Jadval va indekslar migrations.py da; odatda bitta versiya tekshiruvi
+    await migrate(db_pool)
 
-            # Kodlar jadvali
-            await cur.execute("""
-                CREATE TABLE IF NOT EXISTS kino_codes (
-                    code TEXT PRIMARY KEY,
-                    channel TEXT,
-                    message_id INTEGER,
-                    post_count INTEGER
-                )
-            """)
 
-            # title ustunini borligini tekshirish va yo‘q bo‘lsa qo‘shish
-            await cur.execute("""
-                SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
-                WHERE table_name = 'kino_codes' AND column_name = 'title'
-            """)
-            result = await cur.fetchone()
-            if result[0] == 0:
-                await cur.execute("ALTER TABLE kino_codes ADD COLUMN title TEXT")
+# users.status qiymatlari
+USER_ACTIVE = 0
+USER_BLOCKED = 1  # botni bloklagan
+USER_GONE = 2     # akkaunt o‘chirilgan yoki chat topilmadi
 
-            # Statistika jadvali
-            await cur.execute("""
-                CREATE TABLE IF NOT EXISTS stats (
-                    code TEXT PRIMARY KEY,
-                    searched INTEGER DEFAULT 0,
-                    viewed INTEGER DEFAULT 0
+# === Foydalanuvchilarni qo‘shish (bitta ko‘p qatorli so‘rov bilan) ===
+@query
+async def add_users_batch(user_ids, chunk_size=1000):
+    if not user_ids:
+        return
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            for i in range(0, len(user_ids), chunk_size):
+                chunk = user_ids[i:i + chunk_size]
+                placeholders = ", ".join(["(%s)"] * len(chunk))
+                await cur.execute(
+                    f"INSERT IGNORE INTO users (user_id) VALUES {placeholders}", chunk
                 )
+
+# === Foydalanuvchilar soni ===
+# (faol, yetib bo‘lmaydigan) — (status, user_id) indeksi bo‘yicha
+@query
+async def get_user_counts():
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                SELECT COALESCE(SUM(status = 0), 0), COALESCE(SUM(status <> 0), 0) FROM users
             """)
+            active, inactive = await cur.fetchone()
+            return int(active), int(inactive)
 
+# Yangilanish kelgan foydalanuvchilar: faol deb belgilanadi (bloklashni bekor qilgan bo‘lishi mumkin)
+# rows: [(user_id, sana), ...]
+@query
+async def touch_users_batch(rows, chunk_size=1000):
+    if not rows:
+        return
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            for i in range(0, len(rows), chunk_size):
+                await cur.executemany("""
+                    INSERT INTO users (user_id, status, last_seen) VALUES (%s, 0, %s)
+                    ON DUPLICATE KEY UPDATE status = 0, last_seen = VALUES(last_seen)
+                """, rows[i:i + chunk_size])
 
-# === Foydalanuvchi qo‘shish ===
-async def add_user(user_id):
-    async with db_pool.acquire() as conn:
+# Xabar yetkazib bo‘lmaganlar; rows: [(user_id, status), ...]
+@query
+async def set_users_status_batch(rows, chunk_size=1000):
+    if not rows:
+        return
+    async with acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute(
-                "INSERT IGNORE INTO users (user_id) VALUES (%s)", (user_id,)
-            )
+            for i in range(0, len(rows), chunk_size):
+                await cur.executemany("""
+                    INSERT INTO users (user_id, status) VALUES (%s, %s)
+                    ON DUPLICATE KEY UPDATE status = VALUES(status)
+                """, rows[i:i + chunk_size])
 
-# === Foydalanuvchilar soni ===
-async def get_user_count():
-    async with db_pool.acquire() as conn:
+# === Kodlar soni ===
+@query
+async def get_code_count():
+    async with acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute("SELECT COUNT(*) FROM users")
+            await cur.execute("SELECT COUNT(*) FROM kino_codes")
             (count,) = await cur.fetchone()
             return count
 
-# === Kod qo‘shish ===
-async def add_kino_code(code, channel, message_id, post_count, title):
-    async with db_pool.acquire() as conn:
+# === Jami qidirilgan / ko‘rilgan ===
+@query
+async def get_stat_totals():
+    async with acquire() as conn:
         async with conn.cursor() as cur:
             await cur.execute("""
-                INSERT INTO kino_codes (code, channel, message_id, post_count, title)
-                VALUES (%s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    channel = VALUES(channel),
-                    message_id = VALUES(message_id),
-                    post_count = VALUES(post_count),
-                    title = VALUES(title)
-            """, (code, channel, message_id, post_count, title))
+                SELECT COALESCE(SUM(searched), 0), COALESCE(SUM(viewed), 0) FROM stats
+            """)
+            searched, viewed = await cur.fetchone()
+            return int(searched), int(viewed)
 
+# === Eng ko‘p ko‘rilgan kodlar (idx_stats_viewed bo‘yicha) ===
+@query
+async def get_top_codes(limit=10):
+    async with acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
             await cur.execute("""
-                INSERT IGNORE INTO stats (code) VALUES (%s)
-            """, (code,))
+                SELECT s.code, k.title, s.searched, s.viewed
+                FROM stats s LEFT JOIN kino_codes k ON k.code = s.code
+                ORDER BY s.viewed DESC LIMIT %s
+            """, (limit,))
+            return await cur.fetchall()
+
+# === Kod qo‘shish ===
+@query(retry=False)
+async def add_kino_code(code, channel, message_id, post_count, title):
+    await add_kino_codes_batch([(code, channel, message_id, post_count, title)])
+
+# === Kodlarni to‘plab qo‘shish ===
+# rows: [(code, channel, message_id, post_count, title), ...] — bitta tranzaksiyada
+@query
+async def add_kino_codes_batch(rows):
+    if not rows:
+        return
+    async with acquire() as conn:
+        await conn.begin()
+        try:
+            async with conn.cursor() as cur:
+                await cur.executemany("""
+                    INSERT INTO kino_codes (code, channel, message_id, post_count, title)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                        channel = VALUES(channel),
+                        message_id = VALUES(message_id),
+                        post_count = VALUES(post_count),
+                        title = VALUES(title)
+                """, rows)
+
+                await cur.executemany("""
+                    INSERT IGNORE INTO stats (code) VALUES (%s)
+                """, [(row[0],) for row in rows])
+                version = await _bump_db_catalog_version(cur)
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+
+    _catalog_changed(*(row[0] for row in rows), version=version)
+    for code, _, _, _, title in rows:
+        search.index.add(str(code), title)
 
 # === Kodni olish ===
+@query(retry=False)
 async def get_kino_by_code(code):
-    async with db_pool.acquire() as conn:
+    return await kino_cache.get_or_load(str(code), lambda: _fetch_kino_by_code(code))
+
+@query
+async def _fetch_kino_by_code(code):
+    async with acquire() as conn:
         async with conn.cursor(aiomysql.DictCursor) as cur:
             await cur.execute("""
                 SELECT code, channel, message_id, post_count, title
@@ -100,41 +338,173 @@ async def get_kino_by_code(code):
             return await cur.fetchone()
 
 # === Barcha kodlarni olish ===
+@query
 async def get_all_codes():
-    async with db_pool.acquire() as conn:
+    async with acquire() as conn:
         async with conn.cursor(aiomysql.DictCursor) as cur:
             await cur.execute("""
                 SELECT code, title, channel, message_id, post_count FROM kino_codes
             """)
             return await cur.fetchall()
 
+# === Kodlar sahifasi (code_num bo‘yicha keyset) ===
+# after: shu koddan keyingilar, before: shu koddan oldingilar. Bitta ortiqcha
+# qator shu yo‘nalishda yana sahifa borligini bilish uchun olinadi.
+@query
+async def get_codes_page(after=None, before=None, limit=50):
+    if before is not None:
+        where, order, params = "(code_num, code) < (%s, %s)", "DESC", (int(before), before)
+    elif after is not None:
+        where, order, params = "(code_num, code) > (%s, %s)", "ASC", (int(after), after)
+    else:
+        where, order, params = "code_num IS NOT NULL", "ASC", ()
+
+    async with acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(f"""
+                SELECT code, title FROM kino_codes
+                WHERE {where}
+                ORDER BY code_num {order}, code {order}
+                LIMIT %s
+            """, params + (limit + 1,))
+            rows = list(await cur.fetchall())
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before is not None:
+        rows.reverse()
+    return rows, has_more
+
 # === Kodni o‘chirish ===
+@query(retry=False)
 async def delete_kino_code(code):
-    async with db_pool.acquire() as conn:
+    version = None
+    try:
+        async with acquire() as conn:
+            await conn.begin()
+            try:
+                async with conn.cursor() as cur:
+                    await cur.execute("DELETE FROM stats WHERE code = %s", (code,))
+                    await cur.execute("DELETE FROM kino_codes WHERE code = %s", (code,))
+                    deleted = cur.rowcount > 0
+                    version = await _bump_db_catalog_version(cur)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+    finally:
+        # commit natijasi noma'lum bo‘lsa ham keshlar eskirtiriladi
+        _catalog_changed(code, version=version)
+
+    search.index.remove(str(code))
+    return deleted
+
+# === Statistikani to‘plab yangilash ===
+# rows: [(code, searched, viewed), ...] — bitta ko‘p qatorli so‘rov bilan
+@query(retry=False)
+async def add_stats_batch(rows, chunk_size=500):
+    if not rows:
+        return
+    async with acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute("DELETE FROM stats WHERE code = %s", (code,))
-            await cur.execute("DELETE FROM kino_codes WHERE code = %s", (code,))
-            return cur.rowcount > 0
+            for i in range(0, len(rows), chunk_size):
+                chunk = rows[i:i + chunk_size]
+                placeholders = ", ".join(["(%s, %s, %s)"] * len(chunk))
+                params = [value for row in chunk for value in row]
+                await cur.execute(f"""
+                    INSERT INTO stats (code, searched, viewed) VALUES {placeholders}
+                    ON DUPLICATE KEY UPDATE
+                        searched = searched + VALUES(searched),
+                        viewed = viewed + VALUES(viewed)
+                """, params)
 
-# === Statistika yangilash ===
-async def increment_stat(code, field):
-    if field not in ("searched", "viewed", "init"):
+# === Soatlik statistikani to‘plab yozish ===
+# rows: [(hour, code, searched, viewed, episodes), ...]
+@query(retry=False)
+async def add_hourly_stats_batch(rows, chunk_size=500):
+    if not rows:
         return
-    async with db_pool.acquire() as conn:
+    async with acquire() as conn:
         async with conn.cursor() as cur:
-            if field == "init":
-                await cur.execute("""
-                    INSERT IGNORE INTO stats (code, searched, viewed)
-                    VALUES (%s, 0, 0)
-                """, (code,))
-            else:
+            for i in range(0, len(rows), chunk_size):
+                chunk = rows[i:i + chunk_size]
+                placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))
+                params = [value for row in chunk for value in row]
                 await cur.execute(f"""
-                    UPDATE stats SET {field} = {field} + 1 WHERE code = %s
-                """, (code,))
+                    INSERT INTO stats_hourly (hour, code, searched, viewed, episodes)
+                    VALUES {placeholders}
+                    ON DUPLICATE KEY UPDATE
+                        searched = searched + VALUES(searched),
+                        viewed = viewed + VALUES(viewed),
+                        episodes = episodes + VALUES(episodes)
+                """, params)
+
+# === Eski soatlik yozuvlarni kunlikka o‘tkazish ===
+# Bitta tranzaksiyada: ko‘chirish + o‘chirish (ikki marta sanalmaydi)
+@query
+async def rollup_hourly_stats(hour_cutoff, day_cutoff):
+    async with acquire() as conn:
+        await conn.begin()
+        try:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    INSERT INTO stats_daily (day, code, searched, viewed, episodes)
+                    SELECT DATE(hour), code, SUM(searched), SUM(viewed), SUM(episodes)
+                    FROM stats_hourly WHERE hour < %s
+                    GROUP BY DATE(hour), code
+                    ON DUPLICATE KEY UPDATE
+                        searched = stats_daily.searched + VALUES(searched),
+                        viewed = stats_daily.viewed + VALUES(viewed),
+                        episodes = stats_daily.episodes + VALUES(episodes)
+                """, (hour_cutoff,))
+                await cur.execute("DELETE FROM stats_hourly WHERE hour < %s", (hour_cutoff,))
+                await cur.execute("DELETE FROM stats_daily WHERE day < %s", (day_cutoff,))
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+
+# === Trend reytingini qayta hisoblash (oxirgi soatlik yozuvlardan) ===
+@query
+async def refresh_trending(since, computed_at, limit=50):
+    async with acquire() as conn:
+        await conn.begin()
+        try:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT code, SUM(searched), SUM(viewed), SUM(episodes)
+                    FROM stats_hourly WHERE hour >= %s
+                    GROUP BY code
+                    ORDER BY SUM(viewed) + SUM(episodes) DESC
+                    LIMIT %s
+                """, (since, limit))
+                rows = await cur.fetchall()
+                await cur.execute("DELETE FROM trending")
+                if rows:
+                    await cur.executemany("""
+                        INSERT INTO trending (rank_no, code, searched, viewed, episodes, computed_at)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """, [(i, *row, computed_at) for i, row in enumerate(rows, start=1)])
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+
+@query
+async def get_trending(limit=20):
+    async with acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute("""
+                SELECT t.rank_no, t.code, k.title, t.searched, t.viewed, t.episodes, t.computed_at
+                FROM trending t LEFT JOIN kino_codes k ON k.code = t.code
+                ORDER BY t.rank_no LIMIT %s
+            """, (limit,))
+            return await cur.fetchall()
 
 # === Statistikani olish ===
+@query
 async def get_code_stat(code):
-    async with db_pool.acquire() as conn:
+    async with acquire() as conn:
         async with conn.cursor(aiomysql.DictCursor) as cur:
             await cur.execute("""
                 SELECT searched, viewed FROM stats WHERE code = %s
@@ -142,17 +512,215 @@ async def get_code_stat(code):
             return await cur.fetchone()
 
 # === Kod va title ni yangilash ===
+@query(retry=False)
 async def update_anime_code(old_code, new_code, new_title):
-    async with db_pool.acquire() as conn:
+    version = None
+    try:
+        async with acquire() as conn:
+            await conn.begin()
+            try:
+                async with conn.cursor() as cur:
+                    await cur.execute("""
+                        UPDATE kino_codes SET code = %s, title = %s WHERE code = %s
+                    """, (new_code, new_title, old_code))
+                    updated = cur.rowcount > 0
+                    version = await _bump_db_catalog_version(cur)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+    finally:
+        _catalog_changed(old_code, new_code, version=version)
+
+    if search.index.remove(str(old_code)) or updated:
+        search.index.add(str(new_code), new_title)
+
+# === Kesh statistikasi ===
+def get_kino_cache_stats():
+    return kino_cache.stats()
+
+# === Foydalanuvchi IDlari sahifasi (user_id bo‘yicha keyset) ===
+# shard=(index, count) berilsa faqat user_id % count == index bo‘lganlar;
+# active_only — faqat status = 0 (idx_users_status bo‘yicha)
+@query
+async def get_user_ids_page(after_id, limit, shard=None, active_only=False):
+    sql = "SELECT user_id FROM users WHERE user_id > %s"
+    params = [after_id]
+    if active_only:
+        sql += " AND status = 0"
+    if shard is not None:
+        index, count = shard
+        sql += " AND MOD(user_id, %s) = %s"
+        params += [count, index]
+    sql += " ORDER BY user_id LIMIT %s"
+    params.append(limit)
+
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(sql, params)
+            rows = await cur.fetchall()
+            return [row[0] for row in rows]
+
+# === Foydalanuvchi IDlarini oqim sifatida olish ===
+# Butun jadval xotiraga yuklanmaydi: har safar bitta sahifa (ro‘yxat) qaytadi.
+async def iter_user_id_batches(after_id=0, batch_size=1000, shard=None, active_only=False):
+    while True:
+        user_ids = await get_user_ids_page(after_id, batch_size, shard, active_only)
+        if not user_ids:
+            return
+        yield user_ids
+        after_id = user_ids[-1]
+
+# === Ommaviy yuborish jarayoni ===
+@query(retry=False)
+async def create_broadcast(admin_chat_id, from_chat, message_id):
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                INSERT INTO broadcasts (admin_chat_id, from_chat, message_id)
+                VALUES (%s, %s, %s)
+            """, (admin_chat_id, from_chat, message_id))
+            return cur.lastrowid
+
+@query
+async def get_broadcast(broadcast_id):
+    async with acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute("""
+                SELECT id, admin_chat_id, from_chat, message_id, last_user_id, success, fail, status
+                FROM broadcasts WHERE id = %s
+            """, (broadcast_id,))
+            return await cur.fetchone()
+
+@query
+async def get_running_broadcasts():
+    async with acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute("""
+                SELECT id, admin_chat_id, from_chat, message_id, last_user_id, success, fail, status
+                FROM broadcasts WHERE status = 'running'
+            """)
+            return await cur.fetchall()
+
+@query
+async def save_broadcast_progress(broadcast_id, last_user_id, success, fail, status="running"):
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                UPDATE broadcasts SET last_user_id = %s, success = %s, fail = %s, status = %s
+                WHERE id = %s
+            """, (last_user_id, success, fail, status, broadcast_id))
+
+# === Kanallarga nashr holati ===
+# jobs: [(code, channel, from_chat, message_id), ...] — qayta qo‘shilsa "pending" bo‘ladi
+@query
+async def save_publish_jobs(jobs):
+    if not jobs:
+        return
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.executemany("""
+                INSERT INTO publish_jobs (code, channel, from_chat, message_id)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    from_chat = VALUES(from_chat),
+                    message_id = VALUES(message_id),
+                    status = 'pending',
+                    attempts = 0,
+                    last_error = NULL
+            """, jobs)
+
+@query
+async def set_publish_status(code, channel, status, attempts, error=None):
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                UPDATE publish_jobs SET status = %s, attempts = %s, last_error = %s
+                WHERE code = %s AND channel = %s
+            """, (status, attempts, error, code, channel))
+
+@query
+async def get_publish_jobs(status):
+    async with acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute("""
+                SELECT code, channel, from_chat, message_id
+                FROM publish_jobs WHERE status = %s
+            """, (status,))
+            return await cur.fetchall()
+
+# === FSM holatlari ===
+@query
+async def get_fsm_record(chat, user):
+    async with acquire() as conn:
         async with conn.cursor() as cur:
             await cur.execute("""
-                UPDATE kino_codes SET code = %s, title = %s WHERE code = %s
-            """, (new_code, new_title, old_code))
+                SELECT state, data FROM fsm_states WHERE chat = %s AND user = %s
+            """, (chat, user))
+            return await cur.fetchone()
 
-# === Foydalanuvchi IDlarini olish ===
-async def get_all_user_ids():
-    async with db_pool.acquire() as conn:
+@query
+async def save_fsm_record(chat, user, state, data):
+    async with acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute("SELECT user_id FROM users")
+            await cur.execute("""
+                INSERT INTO fsm_states (chat, user, state, data) VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE state = VALUES(state), data = VALUES(data)
+            """, (chat, user, state, data))
+
+@query
+async def delete_fsm_record(chat, user):
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                DELETE FROM fsm_states WHERE chat = %s AND user = %s
+            """, (chat, user))
+
+# Uzoq vaqt o‘zgarmagan (tashlab ketilgan) holatlarni o‘chirish
+@query
+async def delete_idle_fsm_records(idle_seconds):
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("""
+                DELETE FROM fsm_states WHERE updated_at < NOW() - INTERVAL %s SECOND
+            """, (int(idle_seconds),))
+            return cur.rowcount
+
+# === Manba kanallar (imzolangan tugmalardagi qisqa indeks) ===
+@query
+async def get_source_channels():
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT id, channel FROM source_channels")
+            return await cur.fetchall()
+
+# Kanal yo‘q bo‘lsa qo‘shiladi; har holda uning indeksi qaytadi
+@query
+async def add_source_channel(channel):
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("INSERT IGNORE INTO source_channels (channel) VALUES (%s)", (channel,))
+            await cur.execute("SELECT id FROM source_channels WHERE channel = %s", (channel,))
+            (index,) = await cur.fetchone()
+            return index
+
+# === Adminlar ===
+@query
+async def get_admin_ids():
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT user_id FROM admins")
             rows = await cur.fetchall()
             return [row[0] for row in rows]
+
+# Yangi qo‘shilganlar soni qaytadi (mavjudlari o‘zgarmaydi)
+@query
+async def add_admins(user_ids, added_by=None):
+    if not user_ids:
+        return 0
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.executemany("""
+                INSERT IGNORE INTO admins (user_id, added_by) VALUES (%s, %s)
+            """, [(user_id, added_by) for user_id in user_ids])
+            return cur.rowcount
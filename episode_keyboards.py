@@ -0,0 +1,147 @@
+import base64
+import hashlib
+import hmac
+import json
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from cache import TTLCache
+from database import (
+    get_catalog_version, get_known_db_catalog_version,
+    get_source_channels, add_source_channel
+)
+
+# Telegram callback_data chegarasi (baytlarda)
+CALLBACK_DATA_LIMIT = 64
+
+
+# Ko‘p qismli animelar uchun 5 tagacha oraliq tugmasi (kamida 10 qismdan)
+def episode_range_buttons(code, post_count):
+    if post_count <= 10:
+        return []
+    size = max(10, -(-post_count // 5))
+    return [
+        InlineKeyboardButton(
+            f"{start}–{min(start + size - 1, post_count)}",
+            callback_data=f"kinoall:{code}:{start}-{min(start + size - 1, post_count)}"
+        )
+        for start in range(1, post_count + 1, size)
+    ]
+
+
+# === Qismlar klaviaturasi (sahifalangan, tayyor JSON ko‘rinishida keshlangan) ===
+# Telegram bitta inline klaviaturada ~100 tugmadan ko‘pini qabul qilmaydi, shuning
+# uchun qismlar `page_size` tadan sahifalarga bo‘linadi va ◀/▶ bilan almashtiriladi.
+# Kesh kaliti katalog versiyasini o‘z ichiga oladi — kod tahrirlansa yoki
+# o‘chirilsa eski klaviaturalar ishlatilmaydi. Qiymat — reply_markup uchun tayyor
+# JSON satr, aiogram uni o‘zgartirmasdan yuboradi.
+#
+# Qism tugmasi manbani o‘zida olib yuradi va imzolanadi:
+#   e:<kod>:<qism>:<kanal indeksi>:<message_id>:<katalog versiyasi>:<imzo>
+# Versiya joriy bilan mos va imzo to‘g‘ri bo‘lsa, qism bazaga murojaatsiz
+# yuboriladi; aks holda (katalog o‘zgargan, kanal indeksi noma'lum, imzo xato)
+# kod va qism raqami bo‘yicha odatiy yo‘l bilan topiladi. 64 baytga sig‘masa
+# eski "kino:<kod>:<qism>" ko‘rinishi ishlatiladi.
+class EpisodeKeyboards:
+    def __init__(self, secret, page_size=50, row_width=5, maxsize=5000, ttl=3600):
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.page_size = page_size
+        self.row_width = row_width
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._channel_index = {}
+        self._channels = {}
+
+    async def warmup(self):
+        for index, channel in await get_source_channels():
+            self._remember_channel(index, channel)
+
+    def _remember_channel(self, index, channel):
+        self._channel_index[channel] = index
+        self._channels[index] = channel
+
+    async def _index_of(self, channel):
+        channel = str(channel)
+        index = self._channel_index.get(channel)
+        if index is None:
+            try:
+                index = await add_source_channel(channel)
+            except Exception as e:
+                print(f"❌ Manba kanal indeksini olishda xato ({channel}): {e}")
+                return None
+            self._remember_channel(index, channel)
+        return index
+
+    def page_count(self, post_count):
+        return max(1, -(-post_count // self.page_size))
+
+    # kino — get_kino_by_code natijasi
+    async def get(self, code, kino, page=0):
+        post_count = kino["post_count"]
+        page = min(max(page, 0), self.page_count(post_count) - 1)
+        stamp = get_known_db_catalog_version()
+        key = (code, page, get_catalog_version(), stamp)
+        markup = self._cache.get(key)
+        if markup is None:
+            source = None
+            if stamp is not None:
+                index = await self._index_of(kino["channel"])
+                if index is not None:
+                    source = (index, kino["message_id"], stamp)
+            markup = json.dumps(self._build(code, post_count, page, source).to_python(), ensure_ascii=False)
+            self._cache.set(key, markup)
+        return markup
+
+    def _sign(self, payload):
+        digest = hmac.new(self.secret, payload.encode(), hashlib.sha256).digest()[:6]
+        return base64.urlsafe_b64encode(digest).decode()
+
+    def _episode_callback(self, code, number, source):
+        if source is not None:
+            index, base_id, stamp = source
+            payload = f"e:{code}:{number}:{index}:{base_id + number - 1}:{stamp}"
+            data = f"{payload}:{self._sign(payload)}"
+            if len(data.encode()) <= CALLBACK_DATA_LIMIT:
+                return data
+        return f"kino:{code}:{number}"
+
+    # -> (kod, qism, (kanal, message_id) yoki None — bazadan topish kerak)
+    def parse(self, data):
+        if data.startswith("kino:"):
+            _, code, number = data.split(":")
+            return code, int(number), None
+
+        payload, _, signature = data.rpartition(":")
+        _, code, number, index, message_id, stamp = payload.split(":")
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return code, int(number), None
+        channel = self._channels.get(int(index))
+        if channel is None or int(stamp) != get_known_db_catalog_version():
+            return code, int(number), None
+        return code, int(number), (channel, int(message_id))
+
+    def _build(self, code, post_count, page, source):
+        keyboard = InlineKeyboardMarkup(row_width=self.row_width)
+        first = page * self.page_size + 1
+        last = min(first + self.page_size - 1, post_count)
+        keyboard.add(*(
+            InlineKeyboardButton(str(i), callback_data=self._episode_callback(code, i, source))
+            for i in range(first, last + 1)
+        ))
+
+        pages = self.page_count(post_count)
+        if pages > 1:
+            nav = []
+            if page > 0:
+                nav.append(InlineKeyboardButton("◀", callback_data=f"kinop:{code}:{page - 1}"))
+            nav.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data=f"kinop:{code}:{page}"))
+            if page < pages - 1:
+                nav.append(InlineKeyboardButton("▶", callback_data=f"kinop:{code}:{page + 1}"))
+            keyboard.row(*nav)
+
+        if post_count > 1:
+            ranges = episode_range_buttons(code, post_count)
+            if ranges:
+                keyboard.row(*ranges)
+            keyboard.row(InlineKeyboardButton("📦 Hammasini yuborish", callback_data=f"kinoall:{code}"))
+        return keyboard
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,105 @@
+import copy
+import json
+from aiogram.dispatcher.storage import BaseStorage
+from background import PeriodicFlusher
+from cache import TTLCache
+from database import (
+    get_fsm_record,
+    save_fsm_record,
+    delete_fsm_record,
+    delete_idle_fsm_records
+)
+
+_EMPTY = {"state": None, "data": {}}
+
+
+# Tashlab ketilgan holatlarni bazadan davriy tozalash
+class _IdleStateEvictor(PeriodicFlusher):
+    flush_on_stop = False
+
+    def __init__(self, interval, idle_seconds):
+        super().__init__(interval)
+        self.idle_seconds = idle_seconds
+
+    async def flush(self):
+        deleted = await delete_idle_fsm_records(self.idle_seconds)
+        if deleted:
+            print(f"🧹 {deleted} ta eskirgan FSM holati o‘chirildi")
+
+
+# === MySQL FSM storage ===
+# Holatlar fsm_states jadvalida saqlanadi, jarayon ichida write-through kesh
+# bilan (yo‘q holat ham keshlanadi, chunki dispatcher har bir yangilanishda
+# get_state chaqiradi). `state_ttl` soniya o‘zgarmagan holatlar o‘chiriladi.
+# Keshdagi yozuv faqat shu jarayon yozganda yangilanadi — bir nechta jarayonda
+# foydalanuvchi doim bitta jarayonga tushishi kerak (user bo‘yicha sharding).
+class MySQLStorage(BaseStorage):
+    def __init__(self, state_ttl=86400, cache_ttl=600, cache_size=50000, evict_interval=600):
+        self._cache = TTLCache(maxsize=cache_size, ttl=min(cache_ttl, state_ttl))
+        self._evictor = _IdleStateEvictor(evict_interval, state_ttl)
+
+    def start(self):
+        self._evictor.start()
+        self._evictor.wake()
+
+    async def close(self):
+        await self._evictor.stop()
+        self._cache.clear()
+
+    async def wait_closed(self):
+        pass
+
+    async def _get(self, chat, user):
+        chat, user = map(int, self.check_address(chat=chat, user=user))
+
+        async def load():
+            row = await get_fsm_record(chat, user)
+            if row is None:
+                return _EMPTY
+            state, data = row
+            return {"state": state, "data": json.loads(data) if data else {}}
+
+        return (chat, user), await self._cache.get_or_load((chat, user), load)
+
+    async def _save(self, key, state, data):
+        chat, user = key
+        try:
+            if state is None and not data:
+                await delete_fsm_record(chat, user)
+                record = _EMPTY
+            else:
+                await save_fsm_record(chat, user, state, json.dumps(data, ensure_ascii=False))
+                record = {"state": state, "data": copy.deepcopy(data)}
+        except Exception:
+            self._cache.invalidate(key)
+            raise
+        self._cache.set(key, record)
+
+    async def get_state(self, *, chat=None, user=None, default=None):
+        _, record = await self._get(chat, user)
+        return record["state"] or self.resolve_state(default)
+
+    async def get_data(self, *, chat=None, user=None, default=None):
+        _, record = await self._get(chat, user)
+        return copy.deepcopy(record["data"]) if record["data"] else (default or {})
+
+    async def set_state(self, *, chat=None, user=None, state=None):
+        key, record = await self._get(chat, user)
+        await self._save(key, self.resolve_state(state), record["data"])
+
+    async def set_data(self, *, chat=None, user=None, data=None):
+        key, record = await self._get(chat, user)
+        await self._save(key, record["state"], data or {})
+
+    async def update_data(self, *, chat=None, user=None, data=None, **kwargs):
+        key, record = await self._get(chat, user)
+        new_data = copy.deepcopy(record["data"])
+        new_data.update(data or {}, **kwargs)
+        await self._save(key, record["state"], new_data)
+
+    async def reset_state(self, *, chat=None, user=None, with_data=True):
+        key, record = await self._get(chat, user)
+        await self._save(key, None, {} if with_data else record["data"])
+
+    def has_bucket(self):
+        return False
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from datetime import timedelta
+
+# Muddati tugashiga shuncha soniya qolganda link oldindan almashtiriladi
+EXPIRE_MARGIN = 60
+
+
+# === Taklif havolalari menejeri ===
+# Har bir kanal uchun bitta link yaratiladi va qayta ishlatiladi. Link muddati
+# tugaganda yoki berilgan soni member_limit ga yetganda yangisi yaratiladi.
+# Berilgan soni qo‘shilganlar sonidan kam bo‘lmaydi, shuning uchun limitga
+# yetmagan link hech qachon almashtirilmay qolmaydi.
+class InviteLinkManager:
+    def __init__(self, bot, channels, expire_seconds=0, member_limit=0):
+        self.bot = bot
+        self.channels = [ch.strip() for ch in channels if ch.strip()]
+        self.expire_seconds = expire_seconds
+        self.member_limit = member_limit
+        self._links = {}
+        self._locks = {}
+        # Linklar almashganda oshadi (tayyor klaviaturalar keshi kaliti uchun)
+        self.version = 0
+
+    def _is_stale(self, channel):
+        entry = self._links.get(channel)
+        if entry is None:
+            return True
+        if entry["expires"] and entry["expires"] - EXPIRE_MARGIN <= time.time():
+            return True
+        if self.member_limit and entry["issued"] >= self.member_limit:
+            return True
+        return False
+
+    async def _refresh(self, channel):
+        lock = self._locks.setdefault(channel, asyncio.Lock())
+        async with lock:
+            if not self._is_stale(channel):
+                return
+            kwargs = {}
+            if self.expire_seconds:
+                kwargs["expire_date"] = timedelta(seconds=self.expire_seconds)
+            if self.member_limit:
+                kwargs["member_limit"] = self.member_limit
+            try:
+                link = await self.bot.create_chat_invite_link(channel, **kwargs)
+            except Exception as e:
+                print(f"❌ Link yaratishda xatolik: {channel} -> {e}")
+                return
+            self._links[channel] = {
+                "url": link.invite_link,
+                "expires": time.time() + self.expire_seconds if self.expire_seconds else 0,
+                "issued": 0,
+            }
+            self.version += 1
+
+    # Ishga tushishda barcha linklarni bir vaqtda yaratish
+    async def warmup(self):
+        await asyncio.gather(*(self._refresh(channel) for channel in self.channels))
+
+    # Berilgan kanallar uchun [(kanal, url)] — eskirganlari bir vaqtda yangilanadi
+    async def get_links(self, channels=None):
+        channels = self.channels if channels is None else channels
+        stale = [channel for channel in channels if self._is_stale(channel)]
+        if stale:
+            await asyncio.gather(*(self._refresh(channel) for channel in stale))
+
+        links = []
+        for channel in channels:
+            entry = self._links.get(channel)
+            if entry is None:
+                continue
+            entry["issued"] += 1
+            links.append((channel, entry["url"]))
+        return links
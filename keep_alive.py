@@ -1,15 +1,27 @@
-from flask import Flask
-from threading import Thread
+from aiohttp import web
+import metrics
 
-app = Flask('')
 
-@app.route('/')
-def home():
-    return "Bot tirik!"
+async def home(request):
+    return web.Response(text="Bot tirik!")
 
-def run():
-    app.run(host='0.0.0.0', port=8080)
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+# Prometheus text formatida
+async def metrics_view(request):
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+
+def create_app():
+    app = web.Application()
+    app.router.add_get('/', home)
+    app.router.add_get('/metrics', metrics_view)
+    return app
+
+
+# Polling rejimida health server botning o‘z event loop ida ishlaydi
+# (alohida thread va Flask kerak emas)
+async def keep_alive(app=None, host='0.0.0.0', port=8080):
+    runner = web.AppRunner(app or create_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,65 @@
+import sys
+from array import array
+from bisect import bisect_left
+from heapq import merge
+from background import PeriodicFlusher
+from database import iter_user_id_batches, add_users_batch
+
+
+# === Ma'lum foydalanuvchilar to‘plami ===
+# Bazadagi IDlar saralangan array('q') da (har biri 8 bayt) saqlanadi,
+# yangi kelganlari kichik set da turadi va vaqti-vaqti bilan arrayga
+# qo‘shiladi. Bazaga hali yozilmaganlar bitta ko‘p qatorli INSERT bilan
+# davriy ravishda yoziladi, shuning uchun takroriy /start bazaga tushmaydi.
+class KnownUsers(PeriodicFlusher):
+    def __init__(self, interval=5, merge_threshold=10000):
+        super().__init__(interval)
+        self.merge_threshold = merge_threshold
+        self._ids = array("q")
+        self._recent = set()
+        self._pending = set()
+
+    # shard=(index, count): worker faqat o‘ziga tegishli foydalanuvchilarni yuklaydi
+    async def warmup(self, shard=None):
+        ids = array("q")
+        async for user_ids in iter_user_id_batches(shard=shard):
+            ids.extend(user_ids)
+        self._ids = ids
+
+    def __contains__(self, user_id):
+        if user_id in self._recent:
+            return True
+        i = bisect_left(self._ids, user_id)
+        return i < len(self._ids) and self._ids[i] == user_id
+
+    def __len__(self):
+        return len(self._ids) + len(self._recent)
+
+    # Yangi foydalanuvchi bo‘lsa True qaytaradi
+    def add(self, user_id):
+        if user_id in self:
+            return False
+        self._recent.add(user_id)
+        self._pending.add(user_id)
+        if len(self._recent) >= self.merge_threshold:
+            self._ids = array("q", merge(self._ids, sorted(self._recent)))
+            self._recent = set()
+        return True
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, set()
+        try:
+            await add_users_batch(sorted(pending))
+        except Exception:
+            self._pending |= pending
+            raise
+
+    # Taxminiy egallangan xotira (baytlarda)
+    def memory_usage(self):
+        return (
+            sys.getsizeof(self._ids)
+            + sys.getsizeof(self._recent)
+            + sys.getsizeof(self._pending)
+        )
@@ -0,0 +1,257 @@
+# === Yuklama testi ===
+# Mahalliy soxta Bot API server ishga tushiriladi, bot unga TELEGRAM_API_SERVER
+# orqali ulanadi va sintetik (yoki yozib olingan) yangilanishlar to‘g‘ridan-to‘g‘ri
+# dp.process_update ga beriladi. Natija: updates/s va har bir handler uchun
+# p50/p95/p99. Baza — .env dagi (mahalliy) MySQL; statistika va users
+# jadvallariga yozuvlar tushadi, shuning uchun ishlab chiqarish bazasida ishlatmang.
+#
+#   python loadtest.py --updates 5000 --concurrency 100 --latency 0.02
+#   python loadtest.py --replay updates.jsonl
+#   python loadtest.py --api-only --api-port 8081   # faqat soxta API
+#   python loadtest.py --outbound-rate 30 --outbound-chat-rate 1   # ishlab chiqarish limitlari bilan
+#
+# Soxta API ga ulanganda chiquvchi limitlar sukut bo‘yicha o‘chiriladi — aks holda
+# botning o‘zi emas, rejalashtiruvchi (30/s, chatga 1/s) o‘lchanadi.
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+from aiohttp import web
+
+BOT_ID = 100000
+_message_ids = itertools.count(1000)
+
+
+# === Soxta Bot API ===
+def _chat(chat_id):
+    chat_id = str(chat_id)
+    if chat_id.lstrip("-").isdigit():
+        return {"id": int(chat_id), "type": "private"}
+    return {"id": -1000000000000 - abs(hash(chat_id)) % 10 ** 9, "type": "channel", "username": chat_id.lstrip("@")}
+
+
+def _message(chat_id, **extra):
+    return {"message_id": next(_message_ids), "date": int(time.time()), "chat": _chat(chat_id), **extra}
+
+
+def _bot_user():
+    return {"id": BOT_ID, "is_bot": True, "first_name": "Load", "username": "loadtest_bot"}
+
+
+def _result(method, params, member_ratio):
+    chat_id = params.get("chat_id", 0)
+    if method == "getMe":
+        return _bot_user()
+    if method == "getChatMember":
+        status = "member" if random.random() < member_ratio else "left"
+        return {"status": status, "user": {"id": int(params["user_id"]), "is_bot": False, "first_name": "U"}}
+    if method == "createChatInviteLink":
+        return {
+            "invite_link": f"https://t.me/+loadtest{next(_message_ids)}",
+            "creator": _bot_user(),
+            "creates_join_request": False,
+            "is_primary": False,
+            "is_revoked": False
+        }
+    if method == "copyMessage":
+        return {"message_id": next(_message_ids)}
+    if method == "copyMessages":
+        return [{"message_id": next(_message_ids)} for _ in json.loads(params["message_ids"])]
+    if method in ("sendMessage", "forwardMessage", "sendPhoto"):
+        return _message(chat_id, text=params.get("text", ""))
+    if method in ("editMessageText", "editMessageReplyMarkup"):
+        return _message(chat_id)
+    if method == "getUpdates":
+        return []
+    return True
+
+
+def create_fake_api(latency=0.0, jitter=0.0, member_ratio=1.0):
+    calls = {}
+
+    async def handle(request):
+        method = request.match_info["method"]
+        calls[method] = calls.get(method, 0) + 1
+        params = dict(await request.post()) if request.can_read_body else {}
+        delay = latency + random.uniform(0, jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        return web.json_response({"ok": True, "result": _result(method, params, member_ratio)})
+
+    async def stats(request):
+        return web.json_response(calls)
+
+    app = web.Application()
+    app.router.add_get("/stats", stats)
+    app.router.add_route("*", "/bot{token}/{method}", handle)
+    return app
+
+
+def _run_fake_api(port, latency, jitter, member_ratio):
+    web.run_app(create_fake_api(latency, jitter, member_ratio), host="127.0.0.1", port=port, print=None)
+
+
+# === Yangilanishlar ===
+def _user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "language_code": "uz"}
+
+
+def _message_update(update_id, user_id, text):
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"}, "from": _user(user_id), "text": text,
+        **({"entities": [{"type": "bot_command", "offset": 0, "length": 6}]} if text.startswith("/start") else {})
+    }}
+
+
+def _callback_update(update_id, user_id, data):
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id), "from": _user(user_id), "chat_instance": str(user_id), "data": data,
+        "message": {
+            "message_id": update_id, "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"}, "from": _bot_user(), "text": "📺"
+        }
+    }}
+
+
+# Aralash oqim: kod yuborish, kino: tugmasi, /start deep link, "Hammasi" tugmasi, ◀/▶ sahifa
+def synthetic_updates(rows, count, users, mix=(0.5, 0.3, 0.15, 0.02, 0.03)):
+    user_ids = [1000000 + i for i in range(users)]
+    for update_id in range(1, count + 1):
+        row = random.choice(rows)
+        user_id = random.choice(user_ids)
+        kind = random.choices(("code", "episode", "start", "all", "page"), weights=mix)[0]
+        if kind == "code":
+            yield _message_update(update_id, user_id, row["code"])
+        elif kind == "episode":
+            episode = random.randint(1, max(1, row["post_count"] or 1))
+            yield _callback_update(update_id, user_id, f"kino:{row['code']}:{episode}")
+        elif kind == "start":
+            yield _message_update(update_id, user_id, f"/start {row['code']}")
+        elif kind == "all":
+            yield _callback_update(update_id, user_id, f"kinoall:{row['code']}")
+        else:
+            yield _callback_update(update_id, user_id, f"kinop:{row['code']}:{random.randint(0, 2)}")
+
+
+def replayed_updates(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+# === Haydovchi ===
+async def run(args):
+    import main
+    from aiogram import Bot, Dispatcher, types
+    from metrics import MetricsMiddleware
+    from database import get_all_codes, add_kino_codes_batch
+
+    samples = {}
+
+    class SampleRecorder(MetricsMiddleware):
+        def record(self, kind, handler, seconds):
+            samples.setdefault(handler, []).append(seconds)
+
+    dp = main.dp
+    dp.middleware.setup(SampleRecorder())
+    Bot.set_current(dp.bot)
+    Dispatcher.set_current(dp)
+    await main.on_startup(dp)
+
+    if args.seed:
+        await add_kino_codes_batch([
+            (str(900000 + i), main.CHANNELS[0], 2, 12, f"Loadtest anime {i}") for i in range(args.seed)
+        ])
+    rows = await get_all_codes()
+    if args.replay:
+        updates = list(replayed_updates(args.replay))
+    elif not rows:
+        print("❌ Bazada kod yo‘q: --seed N bilan sintetik kodlar qo‘shing")
+        return
+    else:
+        updates = list(synthetic_updates(rows, args.updates, args.users))
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    errors = 0
+
+    async def process(data):
+        nonlocal errors
+        async with semaphore:
+            try:
+                await dp.process_update(types.Update(**data))
+            except Exception as e:
+                errors += 1
+                if errors <= 5:
+                    print(f"❌ {data.get('update_id')}: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(process(data) for data in updates))
+    elapsed = time.perf_counter() - started
+    await main.on_shutdown(dp)
+
+    print(f"\n📦 {len(updates)} ta yangilanish, {elapsed:.2f} s, "
+          f"{len(updates) / elapsed:.0f} updates/s, xatolar: {errors}")
+    print(f"{'handler':<28}{'soni':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for handler, values in sorted(samples.items(), key=lambda item: -len(item[1])):
+        values.sort()
+        print(f"{handler:<28}{len(values):>8}"
+              f"{percentile(values, 0.50) * 1000:>10.1f}"
+              f"{percentile(values, 0.95) * 1000:>10.1f}"
+              f"{percentile(values, 0.99) * 1000:>10.1f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bot yuklama testi")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--replay", help="har qatorda bitta Update JSON bo‘lgan fayl")
+    parser.add_argument("--seed", type=int, default=0, help="shuncha sintetik kod qo‘shish")
+    parser.add_argument("--latency", type=float, default=0.02, help="soxta API kechikishi (s)")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--member-ratio", type=float, default=0.95, help="obuna bo‘lganlar ulushi")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--api-only", action="store_true")
+    parser.add_argument("--outbound-rate", type=float, default=0,
+                        help="umumiy yuborish limiti (1/s), 0 — cheklovsiz")
+    parser.add_argument("--outbound-chat-rate", type=float, default=0,
+                        help="bitta chatga yuborish limiti (1/s), 0 — cheklovsiz")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    api_args = (args.api_port, args.latency, args.jitter, args.member_ratio)
+    if args.api_only:
+        _run_fake_api(*api_args)
+    else:
+        # Soxta API alohida jarayonda: bot bilan bitta CPU uchun raqobatlashmaydi
+        api = multiprocessing.Process(target=_run_fake_api, args=api_args, daemon=True)
+        api.start()
+        time.sleep(0.5)
+        os.environ["TELEGRAM_API_SERVER"] = f"http://127.0.0.1:{args.api_port}"
+        os.environ.setdefault("API_TOKEN", "123456:LOADTEST-loadtest-loadtest-loadtest")
+        os.environ.setdefault("CHANNEL_USERNAMES", "@loadtest_channel")
+        os.environ.setdefault("MAIN_CHANNELS", "@loadtest_main")
+        os.environ.setdefault("BOT_USERNAME", "loadtest_bot")
+        unlimited = 10 ** 6
+        os.environ["OUTBOUND_RATE"] = str(args.outbound_rate or unlimited)
+        os.environ["OUTBOUND_CHAT_RATE"] = str(args.outbound_chat_rate or unlimited)
+        if not args.outbound_chat_rate:
+            os.environ["OUTBOUND_CHAT_BURST"] = str(unlimited)
+        try:
+            asyncio.run(run(args))
+        finally:
+            api.terminate()
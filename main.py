@@ -1,55 +1,171 @@
 # === IMPORTLAR ===
+import hashlib
+import io
 import os
+import time
 from dotenv import load_dotenv
-from aiogram import Bot, Dispatcher, types
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram import Dispatcher, types
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
 from aiogram.types import (
     ReplyKeyboardMarkup, KeyboardButton,
     InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 )
+from aiogram.bot.api import TelegramAPIServer, TELEGRAM_PRODUCTION
 from aiogram.utils import executor
+from aiogram.utils.exceptions import MessageNotModified
+from aiogram.utils.markdown import quote_html
 from keep_alive import keep_alive
+from metrics import MetricsMiddleware, LoopLagMonitor
+import outbound
+from outbound import OutboundScheduler, ScheduledBot
+from webhook import run_webhook
+from fsm_storage import MySQLStorage
+from admins import AdminStore, setup_admin_filter
+from catalog_sync import CatalogSync
+from workers import WorkerPool, run_polling_workers, run_webhook_workers
+import search
+from subscription import SubscriptionStore, LEFT_STATUSES
+from invite_links import InviteLinkManager
+from cache import TTLCache
+from counters import StatCounter
+from broadcast import Broadcaster
+from known_users import KnownUsers
+from catalog_import import parse_fields, import_catalog
+from publisher import Publisher
+from dashboard import Dashboard
+from rollups import UsageRollup
+from bulk_send import EpisodeBatchSender
+from episode_keyboards import EpisodeKeyboards
+from user_activity import UserActivity, ActivityMiddleware
 from database import (
     init_db,
-    add_user,
-    get_user_count,
-    add_kino_code,
+    add_kino_codes_batch,
     get_kino_by_code,
     get_all_codes,
     delete_kino_code,
     get_code_stat,
-    increment_stat,
-    get_all_user_ids,
-    update_anime_code
+    update_anime_code,
+    get_kino_cache_stats,
+    get_codes_page,
+    get_catalog_version,
+    get_trending,
+    USER_BLOCKED
 )
 
 # === YUKLAMALAR ===
 load_dotenv()
-keep_alive()
 
 API_TOKEN = os.getenv("API_TOKEN")
 CHANNELS = os.getenv("CHANNEL_USERNAMES").split(",")
 MAIN_CHANNELS = os.getenv("MAIN_CHANNELS").split(",")
 BOT_USERNAME = os.getenv("BOT_USERNAME")
 
-bot = Bot(token=API_TOKEN)
-storage = MemoryStorage()
+# Ishga tushirish rejimi: "polling" (standart) yoki "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+PORT = int(os.getenv("PORT", 8080))
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST")  # masalan: https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Webhook rejimida majburiy: Telegram uni X-Telegram-Bot-Api-Secret-Token sarlavhasida yuboradi
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", 50))
+# 0 — bitta jarayon; N > 0 — front jarayon yangilanishlarni user_id % N
+# bo‘yicha N ta worker processga taqsimlaydi
+WORKERS = int(os.getenv("WORKERS", 0))
+# Mahalliy Bot API server yoki yuklama testidagi soxta API (loadtest.py)
+API_SERVER = os.getenv("TELEGRAM_API_SERVER")
+
+# Bot API so‘rovlari, handlerlar va DB vaqtlari /metrics da
+bot = ScheduledBot(
+    token=API_TOKEN,
+    server=TelegramAPIServer.from_base(API_SERVER) if API_SERVER else TELEGRAM_PRODUCTION
+)
+# Barcha yuborishlar bitta navbatdan: interaktiv > admin > ommaviy.
+# Worker rejimida umumiy limit workerlar orasida bo‘linadi.
+bot.scheduler = OutboundScheduler(
+    rate=float(os.getenv("OUTBOUND_RATE", 30)) / max(1, WORKERS),
+    chat_rate=float(os.getenv("OUTBOUND_CHAT_RATE", 1)),
+    chat_burst=int(os.getenv("OUTBOUND_CHAT_BURST", 5))
+)
+storage = MySQLStorage(state_ttl=int(os.getenv("FSM_STATE_TTL", 86400)))
 dp = Dispatcher(bot, storage=storage)
+dp.middleware.setup(MetricsMiddleware())
+loop_lag = LoopLagMonitor()
+subscriptions = SubscriptionStore(bot, CHANNELS, ttl=float(os.getenv("SUB_CACHE_TTL", 300)))
+
+stat_counter = StatCounter(interval=float(os.getenv("STATS_FLUSH_INTERVAL", 5)))
+def make_download_markup(code):
+    return InlineKeyboardMarkup().add(
+        InlineKeyboardButton("📥 Yuklab olish", url=f"https://t.me/{BOT_USERNAME}?start={code}")
+    )
 
-async def make_subscribe_markup(code):
-    keyboard = InlineKeyboardMarkup(row_width=1)
-    for channel in CHANNELS:
-        try:
-            invite_link = await bot.create_chat_invite_link(channel.strip())
-            keyboard.add(InlineKeyboardButton("📢 Obuna bo‘lish", url=invite_link.invite_link))
-        except Exception as e:
-            print(f"❌ Link yaratishda xatolik: {channel} -> {e}")
-    keyboard.add(InlineKeyboardButton("✅ Tekshirish", callback_data=f"check_sub:{code}"))
+publisher = Publisher(
+    bot, make_download_markup,
+    concurrency=int(os.getenv("PUBLISH_CONCURRENCY", 10)),
+    chat_rate=float(os.getenv("PUBLISH_CHAT_RATE", 20 / 60))
+)
+usage_rollup = UsageRollup(interval=float(os.getenv("ROLLUP_INTERVAL", 600)))
+# Trend ko‘rinishi tayyor jadvaldan o‘qiladi, qisqa muddat keshlanadi
+trending_cache = TTLCache(maxsize=1, ttl=60)
+dashboard = Dashboard(ttl=float(os.getenv("DASHBOARD_TTL", 30)))
+known_users = KnownUsers(interval=float(os.getenv("USERS_FLUSH_INTERVAL", 5)))
+broadcaster = Broadcaster(
+    bot,
+    rate=float(os.getenv("BROADCAST_RATE", 25)),
+    concurrency=int(os.getenv("BROADCAST_CONCURRENCY", 20))
+)
+
+# "Hammasi" / oraliq tugmalari: qismlar bitta fon vazifasida paketlab yuboriladi
+episode_sender = EpisodeBatchSender(
+    bot,
+    chat_rate=float(os.getenv("EPISODE_CHAT_RATE", 1)),
+    chat_burst=int(os.getenv("EPISODE_CHAT_BURST", 10)),
+    batch_size=int(os.getenv("EPISODE_BATCH_SIZE", 10))
+)
+
+# Qism tugmalarini imzolash kaliti (berilmasa bot tokenidan olinadi)
+episode_keyboards = EpisodeKeyboards(
+    secret=os.getenv("CALLBACK_SECRET") or hashlib.sha256(API_TOKEN.encode()).hexdigest(),
+    page_size=int(os.getenv("EPISODE_PAGE_SIZE", 50))
+)
+
+# chat_member yangilanishlari obuna keshini tozalash uchun kerak
+ALLOWED_UPDATES = (
+    types.AllowedUpdates.MESSAGE
+    | types.AllowedUpdates.CALLBACK_QUERY
+    | types.AllowedUpdates.CHAT_MEMBER
+    | types.AllowedUpdates.MY_CHAT_MEMBER
+)
+
+# Faollik va yetkazib bo‘lmaydigan foydalanuvchilar: broadcast va sanoq faqat faollarga
+user_activity = UserActivity(interval=float(os.getenv("ACTIVITY_FLUSH_INTERVAL", 10)))
+dp.middleware.setup(ActivityMiddleware(user_activity))
+bot.undeliverable = user_activity.undeliverable
+
+invite_links = InviteLinkManager(
+    bot, CHANNELS,
+    expire_seconds=int(os.getenv("INVITE_LINK_EXPIRE", 0)),
+    member_limit=int(os.getenv("INVITE_LINK_MEMBER_LIMIT", 0))
+)
+# Tayyor obuna klaviaturalari: (kod, kanallar, linklar versiyasi) bo‘yicha
+subscribe_keyboards = TTLCache(maxsize=5000, ttl=3600)
+
+async def make_subscribe_markup(code, channels=None):
+    links = await invite_links.get_links(channels)
+    key = (code, tuple(channel for channel, _ in links), invite_links.version)
+    keyboard = subscribe_keyboards.get(key)
+    if keyboard is None:
+        keyboard = InlineKeyboardMarkup(row_width=1)
+        for _, url in links:
+            keyboard.add(InlineKeyboardButton("📢 Obuna bo‘lish", url=url))
+        keyboard.add(InlineKeyboardButton("✅ Tekshirish", callback_data=f"check_sub:{code}"))
+        subscribe_keyboards.set(key, keyboard)
     return keyboard
 
-ADMINS = {6486825926, 7711928526}
+# Boshlang‘ich adminlar: ishga tushishda bazaga qo‘shiladi, qolganlari bazada
+DEFAULT_ADMINS = (6486825926, 7711928526)
+admins = AdminStore(DEFAULT_ADMINS, ttl=float(os.getenv("ADMIN_CACHE_TTL", 60)))
+setup_admin_filter(dp, admins)
 
 # === HOLATLAR ===
 
@@ -87,20 +203,28 @@ class PostStates(StatesGroup):
     
 # === OBUNA TEKSHIRISH ===
 async def is_user_subscribed(user_id):
-    for channel in CHANNELS:
-        try:
-            member = await bot.get_chat_member(channel.strip(), user_id)
-            if member.status not in ["member", "administrator", "creator"]:
-                return False
-        except Exception as e:
-            print(f"❗ Obuna tekshirishda xatolik: {channel} -> {e}")
-            return False
-    return True
+    return await subscriptions.is_subscribed(user_id)
+
+# Kanaldan chiqqan foydalanuvchi keyingi so‘rovda qayta tekshiriladi.
+# state="*": kanal yangilanishlari uchun FSM holati bazadan o‘qilmaydi
+@dp.chat_member_handler(state="*")
+async def chat_member_update(update: types.ChatMemberUpdated):
+    subscriptions.on_member_update(update)
+
+# Foydalanuvchi botni bloklasa / blokdan chiqarsa (FSM holatidan qat'i nazar)
+@dp.my_chat_member_handler(state="*")
+async def bot_member_update(update: types.ChatMemberUpdated):
+    if update.chat.type != "private":
+        return
+    if update.new_chat_member.status == "kicked":
+        user_activity.undeliverable(update.from_user.id, USER_BLOCKED)
+    else:
+        user_activity.seen(update.from_user.id)
 
 # === /start ===
 @dp.message_handler(commands=['start'])
 async def start_handler(message: types.Message):
-    await add_user(message.from_user.id)
+    known_users.add(message.from_user.id)
 
     args = message.get_args()
     if args and args.isdigit():
@@ -112,16 +236,17 @@ async def start_handler(message: types.Message):
             await send_reklama_post(message.from_user.id, code)
         return
 
-    if message.from_user.id in ADMINS:
+    if await admins.contains(message.from_user.id):
         kb = ReplyKeyboardMarkup(resize_keyboard=True)
         kb.add("➕ Anime qo‘shish")
-        kb.add("📊 Statistika", "📈 Kod statistikasi")
+        kb.add("📊 Statistika", "📈 Kod statistikasi", "🔥 Trend")
         kb.add("❌ Kodni o‘chirish", "➕ Admin qo‘shish", "📄 Kodlar ro‘yxati")
         kb.add("✏️ Kodni tahrirlash", "📤 Post qilish")
-        kb.add("✉️ Habar yuborish")
+        kb.add("✉️ Habar yuborish", "🔁 Qayta nashr")
         await message.answer("👮‍♂️ Admin panel:", reply_markup=kb)
     else:
         kb = ReplyKeyboardMarkup(resize_keyboard=True)
+        kb.add(KeyboardButton("🔍 Anime qidirish"))
         kb.add(KeyboardButton("✉️ Admin bilan bog‘lanish"))
         await message.answer("🎬 Botga xush kelibsiz!\nKod kiriting:", reply_markup=kb)
 
@@ -137,26 +262,27 @@ async def forward_to_admins(message: types.Message, state: FSMContext):
     await state.finish()
     user = message.from_user
 
-    for admin_id in ADMINS:
+    for admin_id in await admins.get_all():
         try:
             keyboard = InlineKeyboardMarkup().add(
                 InlineKeyboardButton("✉️ Javob yozish", callback_data=f"reply_user:{user.id}")
             )
 
-            await bot.send_message(
-                admin_id,
-                f"📩 <b>Yangi xabar:</b>\n\n"
-                f"<b>👤 Foydalanuvchi:</b> {user.full_name} | <code>{user.id}</code>\n"
-                f"<b>💬 Xabar:</b> {message.text}",
-                parse_mode="HTML",
-                reply_markup=keyboard
-            )
+            with outbound.priority(outbound.ADMIN):
+                await bot.send_message(
+                    admin_id,
+                    f"📩 <b>Yangi xabar:</b>\n\n"
+                    f"<b>👤 Foydalanuvchi:</b> {user.full_name} | <code>{user.id}</code>\n"
+                    f"<b>💬 Xabar:</b> {message.text}",
+                    parse_mode="HTML",
+                    reply_markup=keyboard
+                )
         except Exception as e:
             print(f"Adminga yuborishda xatolik: {e}")
 
     await message.answer("✅ Xabaringiz yuborildi. Tez orada admin siz bilan bog‘lanadi.")
 
-@dp.callback_query_handler(lambda c: c.data.startswith("reply_user:"), user_id=ADMINS)
+@dp.callback_query_handler(lambda c: c.data.startswith("reply_user:"), is_admin=True)
 async def start_admin_reply(callback: CallbackQuery, state: FSMContext):
     user_id = int(callback.data.split(":")[1])
     await state.update_data(reply_user_id=user_id)
@@ -164,13 +290,14 @@ async def start_admin_reply(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer("✍️ Endi foydalanuvchiga yubormoqchi bo‘lgan xabaringizni yozing.")
     await callback.answer()
 
-@dp.message_handler(state=AdminReplyStates.waiting_for_reply_message, user_id=ADMINS)
+@dp.message_handler(state=AdminReplyStates.waiting_for_reply_message, is_admin=True)
 async def send_admin_reply(message: types.Message, state: FSMContext):
     data = await state.get_data()
     user_id = data.get("reply_user_id")
 
     try:
-        await bot.send_message(user_id, f"✉️ Admindan javob:\n\n{message.text}")
+        with outbound.priority(outbound.ADMIN):
+            await bot.send_message(user_id, f"✉️ Admindan javob:\n\n{message.text}")
         await message.answer("✅ Javob foydalanuvchiga yuborildi.")
     except Exception as e:
         await message.answer(f"❌ Xatolik: {e}")
@@ -178,12 +305,12 @@ async def send_admin_reply(message: types.Message, state: FSMContext):
         await state.finish()
 
 # === Admin qo'shish
-@dp.message_handler(lambda m: m.text == "➕ Admin qo‘shish", user_id=ADMINS)
+@dp.message_handler(lambda m: m.text == "➕ Admin qo‘shish", is_admin=True)
 async def add_admin_start(message: types.Message):
     await message.answer("🆔 Yangi adminning Telegram ID raqamini yuboring.")
     await AdminStates.waiting_for_admin_id.set()
 
-@dp.message_handler(state=AdminStates.waiting_for_admin_id, user_id=ADMINS)
+@dp.message_handler(state=AdminStates.waiting_for_admin_id, is_admin=True)
 async def add_admin_process(message: types.Message, state: FSMContext):
     await state.finish()
     text = message.text.strip()
@@ -193,11 +320,10 @@ async def add_admin_process(message: types.Message, state: FSMContext):
         return
 
     new_admin_id = int(text)
-    if new_admin_id in ADMINS:
+    if not await admins.add(new_admin_id, added_by=message.from_user.id):
         await message.answer("ℹ️ Bu foydalanuvchi allaqachon admin.")
         return
 
-    ADMINS.add(new_admin_id)
     await message.answer(f"✅ <code>{new_admin_id}</code> admin sifatida qo‘shildi.", parse_mode="HTML")
 
     try:
@@ -208,7 +334,7 @@ async def add_admin_process(message: types.Message, state: FSMContext):
 # === Kod statistikasi
 @dp.message_handler(lambda m: m.text == "📈 Kod statistikasi")
 async def ask_stat_code(message: types.Message):
-    if message.from_user.id not in ADMINS:
+    if not await admins.contains(message.from_user.id):
         return
     await message.answer("📥 Kod raqamini yuboring:")
     await AdminStates.waiting_for_stat_code.set()
@@ -220,6 +346,7 @@ async def show_code_stat(message: types.Message, state: FSMContext):
     if not code:
         await message.answer("❗ Kod yuboring.")
         return
+    await stat_counter.flush()
     stat = await get_code_stat(code)
     if not stat:
         await message.answer("❗ Bunday kod statistikasi topilmadi.")
@@ -232,13 +359,13 @@ async def show_code_stat(message: types.Message, state: FSMContext):
         parse_mode="HTML"
     )
 
-@dp.message_handler(lambda message: message.text == "✏️ Kodni tahrirlash", user_id=ADMINS)
+@dp.message_handler(lambda message: message.text == "✏️ Kodni tahrirlash", is_admin=True)
 async def edit_code_start(message: types.Message):
     await message.answer("Qaysi kodni tahrirlashni xohlaysiz? (eski kodni yuboring)")
     await EditCode.WaitingForOldCode.set()
 
 # --- Eski kodni qabul qilish ---
-@dp.message_handler(state=EditCode.WaitingForOldCode, user_id=ADMINS)
+@dp.message_handler(state=EditCode.WaitingForOldCode, is_admin=True)
 async def get_old_code(message: types.Message, state: FSMContext):
     code = message.text.strip()
     post = await get_kino_by_code(code)
@@ -250,14 +377,14 @@ async def get_old_code(message: types.Message, state: FSMContext):
     await EditCode.WaitingForNewCode.set()
 
 # --- Yangi kodni olish ---
-@dp.message_handler(state=EditCode.WaitingForNewCode, user_id=ADMINS)
+@dp.message_handler(state=EditCode.WaitingForNewCode, is_admin=True)
 async def get_new_code(message: types.Message, state: FSMContext):
     await state.update_data(new_code=message.text.strip())
     await message.answer("Yangi nomini yuboring:")
     await EditCode.WaitingForNewTitle.set()
 
 # --- Yangi nomni olish va yangilash ---
-@dp.message_handler(state=EditCode.WaitingForNewTitle, user_id=ADMINS)
+@dp.message_handler(state=EditCode.WaitingForNewTitle, is_admin=True)
 async def get_new_title(message: types.Message, state: FSMContext):
     data = await state.get_data()
     try:
@@ -280,10 +407,9 @@ async def handle_code_message(message: types.Message):
         markup = await make_subscribe_markup(code)
         await message.answer("❗ Kino olishdan oldin quyidagi kanal(lar)ga obuna bo‘ling:", reply_markup=markup)
     else:
-        await increment_stat(code, "init")
-        await increment_stat(code, "searched")
+        stat_counter.add(code, searched=1)
         await send_reklama_post(message.from_user.id, code)
-        await increment_stat(code, "viewed")
+        stat_counter.add(code, viewed=1)
 
 # === Obuna tekshirish callback
 @dp.callback_query_handler(lambda c: c.data.startswith("check_sub:"))
@@ -291,29 +417,20 @@ async def check_sub_callback(callback_query: types.CallbackQuery):
     code = callback_query.data.split(":")[1]
     user_id = callback_query.from_user.id
 
-    not_subscribed = []
-    buttons = []
-
-    for channel in CHANNELS:
-        try:
-            member = await bot.get_chat_member(chat_id=channel, user_id=user_id)
-            if member.status in ['left', 'kicked']:
-                not_subscribed.append(channel)
-                invite_link = await bot.create_chat_invite_link(channel)
-                buttons.append([
-                    InlineKeyboardButton("🔔 Obuna bo‘lish", url=invite_link.invite_link)
-                ])
-        except Exception as e:
-            print(f"❌ Obuna tekshiruv xatosi: {channel} -> {e}")
-            continue
+    statuses = await subscriptions.check(user_id)
+    not_subscribed = [channel for channel, status in statuses.items() if status in LEFT_STATUSES]
 
     if not_subscribed:
-        buttons.append([InlineKeyboardButton("✅ Tekshirish", callback_data=f"check_sub:{code}")])
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
-        await callback_query.message.edit_text(
-            "❗ Hali ham barcha kanallarga obuna bo‘lmagansiz. Iltimos, barchasiga obuna bo‘ling:",
-            reply_markup=keyboard
-        )
+        keyboard = await make_subscribe_markup(code, not_subscribed)
+        # Havolalar va klaviatura keshlangan: qayta bosilganda xabar o‘zgarmaydi
+        try:
+            await callback_query.message.edit_text(
+                "❗ Hali ham barcha kanallarga obuna bo‘lmagansiz. Iltimos, barchasiga obuna bo‘ling:",
+                reply_markup=keyboard
+            )
+        except MessageNotModified:
+            pass
+        await callback_query.answer("❗ Hali ham barcha kanallarga obuna bo‘lmagansiz.", show_alert=True)
     else:
         await callback_query.message.edit_text("✅ Obuna muvaffaqiyatli tekshirildi!")
         await send_reklama_post(user_id, code)
@@ -325,41 +442,90 @@ async def send_reklama_post(user_id, code):
         await bot.send_message(user_id, "❌ Kod topilmadi.")
         return
 
-    channel, reklama_id, post_count = data["channel"], data["message_id"], data["post_count"]
-
-    buttons = [InlineKeyboardButton(str(i), callback_data=f"kino:{code}:{i}") for i in range(1, post_count + 1)]
-    keyboard = InlineKeyboardMarkup(row_width=5)
-    keyboard.add(*buttons)
+    channel, reklama_id = data["channel"], data["message_id"]
+    keyboard = await episode_keyboards.get(code, data)
 
     try:
         await bot.copy_message(user_id, channel, reklama_id - 1, reply_markup=keyboard)
     except:
         await bot.send_message(user_id, "❌ Reklama postni yuborib bo‘lmadi.")
 
-# === Tugma orqali kino yuborish
-@dp.callback_query_handler(lambda c: c.data.startswith("kino:"))
+# === Qismlar sahifasi: kinop:<kod>:<sahifa> — klaviatura joyida almashtiriladi
+@dp.callback_query_handler(lambda c: c.data.startswith("kinop:"))
+async def kino_page(callback: types.CallbackQuery):
+    _, code, page = callback.data.split(":")
+
+    result = await get_kino_by_code(code)
+    if not result:
+        await callback.answer("❌ Kod topilmadi.", show_alert=True)
+        return
+
+    try:
+        await callback.message.edit_reply_markup(
+            await episode_keyboards.get(code, result, int(page))
+        )
+    except MessageNotModified:
+        pass
+    await callback.answer()
+
+# === Tugma orqali kino yuborish: imzolangan e:... (bazasiz) yoki kino:<kod>:<qism>
+@dp.callback_query_handler(lambda c: c.data.startswith(("kino:", "e:")))
 async def kino_button(callback: types.CallbackQuery):
-    _, code, number = callback.data.split(":")
-    number = int(number)
+    code, number, source = episode_keyboards.parse(callback.data)
+
+    if source is None:
+        result = await get_kino_by_code(code)
+        if not result:
+            await callback.message.answer("❌ Kod topilmadi.")
+            return
+
+        if number > result["post_count"]:
+            await callback.answer("❌ Bunday post yo‘q!", show_alert=True)
+            return
+        source = (result["channel"], result["message_id"] + number - 1)
+
+    channel, message_id = source
+    await bot.copy_message(callback.from_user.id, channel, message_id)
+    stat_counter.add(code, episodes=1)
+    await callback.answer()
+
+# === Barcha qismlar yoki oraliq: kinoall:<kod> / kinoall:<kod>:<dan>-<gacha>
+@dp.callback_query_handler(lambda c: c.data.startswith("kinoall:"))
+async def kino_all_button(callback: types.CallbackQuery):
+    user_id = callback.from_user.id
+    _, code, *episode_range = callback.data.split(":")
 
     result = await get_kino_by_code(code)
     if not result:
-        await callback.message.answer("❌ Kod topilmadi.")
+        await callback.answer("❌ Kod topilmadi.", show_alert=True)
         return
 
     channel, base_id, post_count = result["channel"], result["message_id"], result["post_count"]
-
-    if number > post_count:
+    first, last = 1, post_count
+    if episode_range:
+        first, _, last = episode_range[0].partition("-")
+        first, last = int(first), min(int(last), post_count)
+    if first > last:
         await callback.answer("❌ Bunday post yo‘q!", show_alert=True)
         return
 
-    await bot.copy_message(callback.from_user.id, channel, base_id + number - 1)
-    await callback.answer()
+    async def on_done(sent, failed):
+        stat_counter.add(code, episodes=sent)
+        if failed:
+            await bot.send_message(
+                user_id, f"⚠️ {sent} ta qism yuborildi, {failed} tasini yuborib bo‘lmadi."
+            )
+
+    message_ids = [base_id + number - 1 for number in range(first, last + 1)]
+    if not episode_sender.start(user_id, channel, message_ids, on_done):
+        await callback.answer("⏳ Oldingi qismlar hali yuborilmoqda, biroz kuting.", show_alert=True)
+        return
+    await callback.answer(f"📦 {len(message_ids)} ta qism yuborilmoqda...")
 
 # === 📢 Habar yuborish
 @dp.message_handler(lambda m: m.text == "📢 Habar yuborish")
 async def ask_broadcast_info(message: types.Message):
-    if message.from_user.id not in ADMINS:
+    if not await admins.contains(message.from_user.id):
         return
     await AdminStates.waiting_for_broadcast_data.set()
     await message.answer("📨 Habar yuborish uchun format:\n`@kanal xabar_id`", parse_mode="Markdown")
@@ -377,81 +543,124 @@ async def send_forward_only(message: types.Message, state: FSMContext):
         await message.answer("❗ Xabar ID raqam bo‘lishi kerak.")
         return
 
-    msg_id = int(msg_id)
-    users = await get_all_user_ids()  # Foydalanuvchilar ro‘yxati
-
-    success = 0
-    fail = 0
-
-    for user_id in users:
-        try:
-            await bot.forward_message(
-                chat_id=user_id,
-                from_chat_id=channel_username,
-                message_id=msg_id
-            )
-            success += 1
-        except Exception as e:
-            print(f"Xatolik {user_id} uchun: {e}")
-            fail += 1
-
-    await message.answer(f"✅ Yuborildi: {success} ta\n❌ Xatolik: {fail} ta")
+    # Yuborish fon rejimida ketadi, holati alohida xabarda yangilanib turadi
+    broadcast_id = await broadcaster.start(message.chat.id, channel_username, int(msg_id))
+    await message.answer(f"🚀 Yuborish boshlandi (#{broadcast_id}).")
 
 # === ➕ Anime qo‘shish
 @dp.message_handler(lambda m: m.text == "➕ Anime qo‘shish")
 async def add_start(message: types.Message):
-    if message.from_user.id in ADMINS:
+    if await admins.contains(message.from_user.id):
         await AdminStates.waiting_for_kino_data.set()
-        await message.answer("📝 Format: `KOD @kanal REKLAMA_ID POST_SONI ANIME_NOMI`\nMasalan: `91 @MyKino 4 12 naruto`", parse_mode="Markdown")
+        await message.answer(
+            "📝 Format: `KOD @kanal REKLAMA_ID POST_SONI ANIME_NOMI`\nMasalan: `91 @MyKino 4 12 naruto`\n\n"
+            "📎 Ko‘p kodlar uchun shu ustunlardagi CSV/TSV faylni yuborishingiz mumkin.",
+            parse_mode="Markdown"
+        )
+
+# === CSV/TSV fayldan import
+@dp.message_handler(content_types=types.ContentType.DOCUMENT, state=AdminStates.waiting_for_kino_data)
+async def import_kino_file(message: types.Message, state: FSMContext):
+    await state.finish()
+    document = message.document
+    await message.answer("⏳ Fayl import qilinmoqda...")
+
+    data = await document.download(destination_file=io.BytesIO())
+    data.seek(0)
+    imported, errors, elapsed = await import_catalog(data, document.file_name)
+
+    rate = len(imported) / elapsed if elapsed else 0
+    text = (
+        f"✅ Import tugadi:\n\n"
+        f"✅ Qo‘shildi: {len(imported)}\n"
+        f"❌ Xatolik: {len(errors)}\n"
+        f"⚡️ Tezlik: {rate:.0f} qator/s"
+    )
+    if errors:
+        text += "\n\n" + "\n".join(f"{line_no}-qator: {error}" for line_no, error in errors[:20])
+    await message.answer(text)
+
+    # To‘liq xatolar ro‘yxati fayl sifatida
+    if len(errors) > 20:
+        report = "\n".join(f"{line_no}\t{error}" for line_no, error in errors)
+        await message.answer_document(
+            types.InputFile(io.BytesIO(report.encode("utf-8")), filename="import_xatolar.tsv")
+        )
+
+    # Matnli usuldagidek har bir qo‘shilgan kod MAIN_CHANNELS ga nashr qilinadi
+    if not imported:
+        return
+    await message.answer(f"📢 {len(imported)} ta kod kanallarga nashr qilinmoqda...")
+    results = await publisher.publish([
+        (code, ch.strip(), server_channel, message_id - 1)
+        for code, server_channel, message_id, post_count, title in imported
+        for ch in MAIN_CHANNELS
+    ])
+    failed_jobs = [(job, error) for job, error in results if error]
+    text = f"📢 Nashr tugadi:\n\n✅ Muvaffaqiyatli: {len(results) - len(failed_jobs)}\n❌ Xatolik: {len(failed_jobs)}"
+    text += format_publish_errors(failed_jobs)
+    await message.answer(text)
 
 @dp.message_handler(state=AdminStates.waiting_for_kino_data)
 async def add_kino_handler(message: types.Message, state: FSMContext):
     rows = message.text.strip().split("\n")
     successful = 0
     failed = 0
-    for row in rows:
-        parts = row.strip().split()
-        if len(parts) < 5:
-            failed += 1
-            continue
 
-        code, server_channel, reklama_id, post_count = parts[:4]
-        title = " ".join(parts[4:])
-
-        if not (code.isdigit() and reklama_id.isdigit() and post_count.isdigit()):
+    parsed = []
+    for row in rows:
+        fields, error = parse_fields(row.split())
+        if error:
             failed += 1
             continue
+        parsed.append(fields)
+
+    await add_kino_codes_batch([
+        (code, server_channel, reklama_id + 1, post_count, title)
+        for code, server_channel, reklama_id, post_count, title in parsed
+    ])
+
+    # Har bir (kod, kanal) alohida vazifa sifatida bir vaqtda nashr qilinadi
+    results = await publisher.publish([
+        (code, ch.strip(), server_channel, reklama_id)
+        for code, server_channel, reklama_id, post_count, title in parsed
+        for ch in MAIN_CHANNELS
+    ])
+    failed_jobs = [(job, error) for job, error in results if error]
+    failed_codes = {job[0] for job, _ in failed_jobs}
+    successful = len(parsed) - len(failed_codes)
+    failed += len(failed_codes)
+
+    text = f"✅ Yangi kodlar qo‘shildi:\n\n✅ Muvaffaqiyatli: {successful}\n❌ Xatolik: {failed}"
+    text += format_publish_errors(failed_jobs)
+    await message.answer(text)
+    await state.finish()
 
-        reklama_id = int(reklama_id)
-        post_count = int(post_count)
-
-        await add_kino_code(code, server_channel, reklama_id + 1, post_count, title)
-
-        download_btn = InlineKeyboardMarkup().add(
-            InlineKeyboardButton("📥 Yuklab olish", url=f"https://t.me/{BOT_USERNAME}?start={code}")
-        )
+def format_publish_errors(failed_jobs, limit=20):
+    if not failed_jobs:
+        return ""
+    lines = [f"{code} → {channel}: {error}" for (code, channel, _, _), error in failed_jobs[:limit]]
+    return "\n\n⚠️ Nashr qilinmadi (🔁 Qayta nashr bilan qayta urinish mumkin):\n" + "\n".join(lines)
 
-        try:
-            for ch in MAIN_CHANNELS:
-                await bot.copy_message(
-                    chat_id=ch,
-                    from_chat_id=server_channel,
-                        message_id=reklama_id,
-                reply_markup=download_btn
-        ) 
-
-            successful += 1
-        except:
-            failed += 1
-
-    await message.answer(f"✅ Yangi kodlar qo‘shildi:\n\n✅ Muvaffaqiyatli: {successful}\n❌ Xatolik: {failed}")
-    await state.finish()
+# === 🔁 Muvaffaqiyatsiz nashrlarni qayta yuborish
+@dp.message_handler(lambda m: m.text == "🔁 Qayta nashr")
+async def retry_publish(message: types.Message):
+    if not await admins.contains(message.from_user.id):
+        return
+    results = await publisher.retry_failed()
+    if not results:
+        await message.answer("ℹ️ Qayta yuboriladigan nashr yo‘q.")
+        return
+    failed_jobs = [(job, error) for job, error in results if error]
+    text = f"🔁 Qayta nashr:\n\n✅ Muvaffaqiyatli: {len(results) - len(failed_jobs)}\n❌ Xatolik: {len(failed_jobs)}"
+    text += format_publish_errors(failed_jobs)
+    await message.answer(text)
 
 
 
 @dp.message_handler(lambda m: m.text == "📤 Post qilish")
 async def start_post_process(message: types.Message):
-    if message.from_user.id in ADMINS:
+    if await admins.contains(message.from_user.id):
         await PostStates.waiting_for_image.set()
         await message.answer("🖼 Iltimos, post uchun rasm yuboring.")
 @dp.message_handler(content_types=types.ContentType.PHOTO, state=PostStates.waiting_for_image)
@@ -490,23 +699,56 @@ async def get_post_link(message: types.Message, state: FSMContext):
         await state.finish()
 
 # === Kodlar ro‘yxati
+CODES_PAGE_SIZE = 50
+# Tayyor sahifalar (katalog versiyasi, after, before) bo‘yicha — katalog
+# o‘zgarguncha sahifa bazaga murojaatsiz qayta ishlatiladi
+codes_pages = TTLCache(maxsize=500, ttl=3600)
+
+async def render_codes_page(after=None, before=None):
+    key = (get_catalog_version(), after, before)
+    page = codes_pages.get(key)
+    if page is not None:
+        return page
+
+    rows, has_more = await get_codes_page(after=after, before=before, limit=CODES_PAGE_SIZE)
+    if not rows:
+        page = ("⛔️ Hech qanday kod topilmadi.", None)
+    else:
+        text = "📄 <b>Kodlar ro‘yxati:</b>\n\n" + "\n".join(
+            f"<code>{row['code']}</code> - <b>{quote_html(row['title'] or '')}</b>" for row in rows
+        )
+        has_prev = has_more if before is not None else after is not None
+        has_next = has_more if before is None else True
+        buttons = []
+        if has_prev:
+            buttons.append(InlineKeyboardButton("◀️", callback_data=f"codes:<:{rows[0]['code']}"))
+        if has_next:
+            buttons.append(InlineKeyboardButton("▶️", callback_data=f"codes:>:{rows[-1]['code']}"))
+        keyboard = InlineKeyboardMarkup().row(*buttons) if buttons else None
+        page = (text, keyboard)
+    codes_pages.set(key, page)
+    return page
+
 @dp.message_handler(lambda m: m.text.strip() == "📄 Kodlar ro‘yxati")
 async def kodlar(message: types.Message):
-    kodlar = await get_all_codes()
-    if not kodlar:
-        await message.answer("⛔️ Hech qanday kod topilmadi.")
-        return
-
-    # Kodlarni raqam bo‘yicha kichikdan kattasiga saralash
-    kodlar = sorted(kodlar, key=lambda x: int(x["code"]))
+    text, keyboard = await render_codes_page()
+    await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
 
-    text = "📄 *Kodlar ro‘yxati:*\n\n"
-    for row in kodlar:
-        code = row["code"]
-        title = row["title"]
-        text += f"`{code}` - *{title}*\n"
-
-    await message.answer(text, parse_mode="Markdown")
+@dp.callback_query_handler(lambda c: c.data.startswith("codes:"))
+async def kodlar_page(callback: types.CallbackQuery):
+    _, direction, code = callback.data.split(":", 2)
+    if not code.isdigit():
+        await callback.answer()
+        return
+    if direction == "<":
+        text, keyboard = await render_codes_page(before=code)
+    else:
+        text, keyboard = await render_codes_page(after=code)
+    try:
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+    except MessageNotModified:
+        pass
+    await callback.answer()
 
 @dp.message_handler(lambda m: m.text == "🔍 Anime qidirish")
 async def search_start(message: types.Message):
@@ -521,29 +763,69 @@ async def perform_search(message: types.Message, state: FSMContext):
         return
 
     query = message.text.strip().lower()
-    results = await search.anime_search(query)  # search.py faylidan funksiya
+    results = await search.anime_search(query)  # search.py dagi trigram indeks
 
     if not results:
         await message.answer("❗ Hech narsa topilmadi.")
     else:
         msg = "🔍 Qidiruv natijalari:\n\n"
         for r in results:
-            msg += f"🎬 <b>{r['title']}</b>\n🔗 <code>{r['code']}</code>\n\n"
+            msg += f"🎬 <b>{quote_html(r['title'])}</b>\n🔗 <code>{r['code']}</code>\n\n"
         await message.answer(msg, parse_mode="HTML")
 
     await state.finish()
     
 # === Statistika
-@dp.message_handler(lambda m: m.text == "📊 Statistika")
+@dp.message_handler(lambda m: m.text == "📊 Statistika", is_admin=True)
 async def stats(message: types.Message):
-    kodlar = await get_all_codes()
-    foydalanuvchilar = await get_user_count()
-    await message.answer(f"📦 Kodlar: {len(kodlar)}\n👥 Foydalanuvchilar: {foydalanuvchilar}")
+    data = await dashboard.get()
+    kesh = get_kino_cache_stats()
+    obuna = subscriptions.stats()
+    navbat = bot.scheduler.stats()
+
+    top = "\n".join(
+        f"{i}. <code>{row['code']}</code> {quote_html(row['title'] or '—')} — 👁 {row['viewed']}"
+        for i, row in enumerate(data["top"], start=1)
+    )
+    await message.answer(
+        f"📦 Kodlar: {data['codes']}\n👥 Foydalanuvchilar: {data['users']} faol, "
+        f"{data['inactive_users']} ta bloklagan / o‘chgan\n"
+        f"🔍 Jami qidirilgan: {data['searched']}\n👁 Jami ko‘rilgan: {data['viewed']}\n\n"
+        f"🏆 <b>Eng ko‘p ko‘rilganlar:</b>\n{top or '—'}\n\n"
+        f"🗄 Kesh: {kesh['hits']} hit / {kesh['misses']} miss ({kesh['hit_rate']:.0%})\n"
+        f"🔔 Obuna keshi: {obuna['hits']} hit / {obuna['misses']} miss ({obuna['hit_rate']:.0%})\n"
+        f"🧠 Ma'lum foydalanuvchilar: {len(known_users)} ta, {known_users.memory_usage() // 1024} KB\n"
+        f"📮 Yuborish navbati: {navbat['queued']['interactive']} / {navbat['queued']['admin']} / "
+        f"{navbat['queued']['bulk']} (interaktiv / admin / ommaviy)\n"
+        f"🕒 Yangilangan: {time.strftime('%H:%M:%S', time.localtime(data['computed_at']))}",
+        parse_mode="HTML"
+    )
+
+# === 🔥 Oxirgi 24 soat trendi
+@dp.message_handler(lambda m: m.text == "🔥 Trend")
+async def trending(message: types.Message):
+    if not await admins.contains(message.from_user.id):
+        return
+    rows = await trending_cache.get_or_load("trending", get_trending)
+    if not rows:
+        await message.answer("ℹ️ Trend hali hisoblanmagan.")
+        return
+
+    lines = [
+        f"{row['rank_no']}. <code>{row['code']}</code> {quote_html(row['title'] or '—')}"
+        f" — 👁 {row['viewed']} | 🎞 {row['episodes']} | 🔍 {row['searched']}"
+        for row in rows
+    ]
+    await message.answer(
+        "🔥 <b>Oxirgi 24 soat trendi:</b>\n\n" + "\n".join(lines)
+        + f"\n\n🕒 Hisoblangan (UTC): {rows[0]['computed_at']:%H:%M}",
+        parse_mode="HTML"
+    )
 
 # === ❌ Kodni o‘chirish
 @dp.message_handler(lambda m: m.text == "❌ Kodni o‘chirish")
 async def ask_delete_code(message: types.Message):
-    if message.from_user.id in ADMINS:
+    if await admins.contains(message.from_user.id):
         await AdminStates.waiting_for_delete_code.set()
         await message.answer("🗑 Qaysi kodni o‘chirmoqchisiz? Kodni yuboring.")
 
@@ -560,10 +842,103 @@ async def delete_code_handler(message: types.Message, state: FSMContext):
     else:
         await message.answer("❌ Kod topilmadi yoki o‘chirib bo‘lmadi.")
 
+# Worker rejimida boshqa jarayonlardagi katalog o‘zgarishlarini kuzatish
+catalog_sync = CatalogSync(interval=float(os.getenv("CATALOG_SYNC_INTERVAL", 5)))
+
+metrics_runner = None
+
 # === START ===
-async def on_startup(dp):
+# shard: worker rejimida (index, count), aks holda None. Yagona nusxada
+# ishlashi kerak bo‘lgan fon vazifalari faqat lider (0-worker) da ishlaydi.
+async def on_startup(dp, shard=None):
+    global metrics_runner
+    leader = shard is None or shard[0] == 0
+    if shard is not None:
+        # Har bir worker o‘z /metrics ini PORT + 1 + index da beradi
+        metrics_runner = await keep_alive(port=PORT + 1 + shard[0])
+    loop_lag.start()
+    bot.scheduler.start()
     await init_db()
     print("✅ PostgreSQL bazaga ulandi!")
+    if leader:
+        storage.start()
+    # Versiya yagona nusxada ham o‘qiladi: imzolangan qism tugmalari uchun kerak
+    await catalog_sync.warmup()
+    if shard is not None:
+        catalog_sync.start()
+    search.index.load(await get_all_codes())
+    await admins.warmup()
+    await episode_keyboards.warmup()
+    await invite_links.warmup()
+    stat_counter.start()
+    publisher.start()
+    if leader:
+        usage_rollup.start()
+        usage_rollup.wake()
+        await publisher.resume()
+    await known_users.warmup(shard)
+    known_users.start()
+    user_activity.start()
+    if leader:
+        await broadcaster.resume()
+
+async def on_shutdown(dp):
+    await loop_lag.stop()
+    await catalog_sync.stop()
+    await publisher.stop()
+    await usage_rollup.stop()
+    await broadcaster.stop()
+    await episode_sender.stop()
+    await stat_counter.stop()
+    await known_users.stop()
+    await user_activity.stop()
+    await bot.scheduler.stop()
+    if metrics_runner is not None:
+        await metrics_runner.cleanup()
+
+# Polling rejimida health endpoint ham shu event loop da ishlaydi
+health_runner = None
+
+async def on_startup_polling(dp):
+    global health_runner
+    health_runner = await keep_alive(port=PORT)
+    await on_startup(dp)
+
+async def on_shutdown_polling(dp):
+    await on_shutdown(dp)
+    if health_runner is not None:
+        await health_runner.cleanup()
 
 if __name__ == "__main__":
-    executor.start_polling(dp, skip_updates=True, on_startup=on_startup)
+    if BOT_MODE == "webhook" and not WEBHOOK_HOST:
+        raise SystemExit("❌ BOT_MODE=webhook uchun WEBHOOK_HOST ni ko‘rsating (masalan: https://bot.example.com)")
+    if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+        raise SystemExit("❌ BOT_MODE=webhook uchun WEBHOOK_SECRET ni ko‘rsating (1-256 ta belgi: A-Z, a-z, 0-9, _ va -)")
+    if WORKERS > 0:
+        pool = WorkerPool(dp, WORKERS, on_startup, on_shutdown, concurrency=WEBHOOK_CONCURRENCY)
+        if BOT_MODE == "webhook":
+            run_webhook_workers(
+                pool, WEBHOOK_HOST, WEBHOOK_PATH,
+                secret=WEBHOOK_SECRET,
+                allowed_updates=ALLOWED_UPDATES,
+                port=PORT
+            )
+        else:
+            run_polling_workers(pool, allowed_updates=ALLOWED_UPDATES, port=PORT)
+    elif BOT_MODE == "webhook":
+        run_webhook(
+            dp, WEBHOOK_HOST, WEBHOOK_PATH,
+            on_startup=on_startup,
+            on_shutdown=on_shutdown,
+            secret=WEBHOOK_SECRET,
+            concurrency=WEBHOOK_CONCURRENCY,
+            allowed_updates=ALLOWED_UPDATES,
+            port=PORT
+        )
+    else:
+        executor.start_polling(
+            dp, skip_updates=True,
+            on_startup=on_startup_polling,
+            on_shutdown=on_shutdown_polling,
+            allowed_updates=ALLOWED_UPDATES
+        )
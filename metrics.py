@@ -0,0 +1,212 @@
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from aiogram import Bot
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+# Sekundlarda: 1 ms dan 10 s gacha
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+# === Hisoblagich (faqat o‘sadi) ===
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self):
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+# === Joriy qiymat: qo‘lda o‘rnatiladi yoki har so‘rovda funksiyadan o‘qiladi ===
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), function=None):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+        self.function = function
+
+    def set(self, value, *labels):
+        self._values[labels] = value
+
+    def _samples(self):
+        if self.function is not None:
+            value = self.function()
+            if value is not None:
+                yield f"{self.name} {value}"
+            return
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+# === Gistogramma (kumulyativ bucketlar, Prometheus formatida) ===
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, value, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def _samples(self):
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+def render():
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# === Umumiy metrikalar ===
+handler_seconds = Histogram(
+    "bot_handler_seconds", "Yangilanishni qayta ishlash vaqti (filtrlar bilan)",
+    ("type", "handler")
+)
+db_query_seconds = Histogram("bot_db_query_seconds", "database.py funksiyalari vaqti", ("query",))
+db_query_errors = Counter("bot_db_query_errors_total", "database.py funksiyalaridagi xatolar", ("query",))
+api_request_seconds = Histogram("bot_api_request_seconds", "Bot API so‘rovlari vaqti", ("method",))
+api_request_errors = Counter("bot_api_request_errors_total", "Bot API xatolari", ("method", "error"))
+loop_lag_seconds = Histogram(
+    "bot_event_loop_lag_seconds", "Event loop kechikishi",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+
+
+# === DB funksiyalarini o‘lchash uchun dekorator ===
+def timed_query(func):
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            db_query_errors.inc(name)
+            raise
+        finally:
+            db_query_seconds.observe(time.perf_counter() - started, name)
+
+    return wrapper
+
+
+# === Handler vaqti ===
+# pre_process da boshlanadi, post_process da yoziladi; qaysi handler
+# ishlagani process_* bosqichida current_handler dan olinadi.
+class MetricsMiddleware(BaseMiddleware):
+    STAGES = (("pre", "pre_process_"), ("post", "post_process_"), ("process", "process_"))
+
+    async def trigger(self, action, args):
+        for stage, prefix in self.STAGES:
+            if action.startswith(prefix):
+                kind = action[len(prefix):]
+                break
+        else:
+            return
+        # Butun update emas, aniq turdagi (message, callback_query, ...) handler o‘lchanadi
+        if kind == "update":
+            return
+        data = args[-1]
+        if stage == "pre":
+            data["_metrics_started"] = time.perf_counter()
+        elif stage == "process":
+            handler = current_handler.get(None)
+            data["_metrics_handler"] = getattr(handler, "__name__", "unknown")
+        elif stage == "post":
+            started = data.get("_metrics_started")
+            if started is not None:
+                self.record(kind, data.get("_metrics_handler", "unhandled"), time.perf_counter() - started)
+
+    def record(self, kind, handler, seconds):
+        handler_seconds.observe(seconds, kind, handler)
+
+
+# === Bot API so‘rovlarini o‘lchovchi Bot ===
+# Barcha bot.* metodlari oxir-oqibat request() orqali o‘tadi.
+class MeteredBot(Bot):
+    async def request(self, method, data=None, files=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().request(method, data, files, **kwargs)
+        except Exception as e:
+            api_request_errors.inc(method, type(e).__name__)
+            raise
+        finally:
+            api_request_seconds.observe(time.perf_counter() - started, method)
+
+
+# === Event loop kechikishi ===
+# Har `interval` soniyada uxlab, kutilgandan qancha kech uyg‘onganini o‘lchaydi.
+class LoopLagMonitor:
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            loop_lag_seconds.observe(max(0.0, time.perf_counter() - started - self.interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
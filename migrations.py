@@ -0,0 +1,280 @@
+import aiomysql
+
+# Bir nechta jarayon bir vaqtda migratsiya qilmasligi uchun
+LOCK_NAME = "schema_migrations"
+
+
+async def _column_exists(cur, table, column):
+    await cur.execute("""
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    (count,) = await cur.fetchone()
+    return count > 0
+
+
+async def _index_exists(cur, table, index):
+    await cur.execute("""
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, index))
+    (count,) = await cur.fetchone()
+    return count > 0
+
+
+# === 1: boshlang‘ich jadvallar ===
+async def _v1_initial(cur):
+    # Foydalanuvchilar jadvali
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT PRIMARY KEY
+        )
+    """)
+
+    # Kodlar jadvali (kod B-tree indeksli qat'iy uzunlikdagi kalit)
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS kino_codes (
+            code VARCHAR(32) NOT NULL PRIMARY KEY,
+            channel TEXT,
+            message_id INTEGER,
+            post_count INTEGER,
+            title TEXT
+        )
+    """)
+
+    # Statistika jadvali
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS stats (
+            code VARCHAR(32) NOT NULL PRIMARY KEY,
+            searched INTEGER DEFAULT 0,
+            viewed INTEGER DEFAULT 0
+        )
+    """)
+
+    # Ommaviy xabar yuborish jarayonlari (qayta tiklash uchun)
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            admin_chat_id BIGINT,
+            from_chat VARCHAR(64),
+            message_id INTEGER,
+            last_user_id BIGINT DEFAULT 0,
+            success INTEGER DEFAULT 0,
+            fail INTEGER DEFAULT 0,
+            status VARCHAR(16) DEFAULT 'running',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+# === 2: eski bazalarni yangi kalit turiga o‘tkazish va indekslar ===
+# Ma'lumotlar saqlanadi: MODIFY mavjud qiymatlarni VARCHAR(32) ga o‘giradi.
+async def _v2_code_keys(cur):
+    if not await _column_exists(cur, "kino_codes", "title"):
+        await cur.execute("ALTER TABLE kino_codes ADD COLUMN title TEXT")
+    await cur.execute("ALTER TABLE kino_codes MODIFY code VARCHAR(32) NOT NULL")
+    await cur.execute("ALTER TABLE stats MODIFY code VARCHAR(32) NOT NULL")
+
+    # Ishga tushishda tugallanmagan broadcastlarni qidirish uchun
+    if not await _index_exists(cur, "broadcasts", "idx_broadcasts_status"):
+        await cur.execute("CREATE INDEX idx_broadcasts_status ON broadcasts (status)")
+
+
+# === 3: MAIN_CHANNELS ga nashr holati (kod × kanal) ===
+async def _v3_publish_jobs(cur):
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS publish_jobs (
+            code VARCHAR(32) NOT NULL,
+            channel VARCHAR(64) NOT NULL,
+            from_chat VARCHAR(64),
+            message_id INTEGER,
+            status VARCHAR(16) DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (code, channel),
+            INDEX idx_publish_jobs_status (status)
+        )
+    """)
+
+
+# === 4: kodlarni son sifatida tartiblash uchun indeksli ustun ===
+# Raqamli bo‘lmagan kodlar uchun NULL (ro‘yxatda ko‘rinmaydi).
+async def _v4_code_num(cur):
+    if not await _column_exists(cur, "kino_codes", "code_num"):
+        await cur.execute("""
+            ALTER TABLE kino_codes
+            ADD COLUMN code_num BIGINT UNSIGNED
+                AS (IF(code REGEXP '^[0-9]{1,18}$', CAST(code AS UNSIGNED), NULL)) STORED
+        """)
+    if not await _index_exists(cur, "kino_codes", "idx_kino_codes_code_num"):
+        await cur.execute("CREATE INDEX idx_kino_codes_code_num ON kino_codes (code_num, code)")
+
+
+# === 5: eng ko‘p ko‘rilgan kodlar (top-N) uchun indeks ===
+async def _v5_stats_viewed(cur):
+    if not await _index_exists(cur, "stats", "idx_stats_viewed"):
+        await cur.execute("CREATE INDEX idx_stats_viewed ON stats (viewed)")
+
+
+# === 6: soatlik / kunlik foydalanish va trend reytingi ===
+async def _v6_usage_rollups(cur):
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS stats_hourly (
+            hour DATETIME NOT NULL,
+            code VARCHAR(32) NOT NULL,
+            searched INTEGER DEFAULT 0,
+            viewed INTEGER DEFAULT 0,
+            episodes INTEGER DEFAULT 0,
+            PRIMARY KEY (hour, code)
+        )
+    """)
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS stats_daily (
+            day DATE NOT NULL,
+            code VARCHAR(32) NOT NULL,
+            searched INTEGER DEFAULT 0,
+            viewed INTEGER DEFAULT 0,
+            episodes INTEGER DEFAULT 0,
+            PRIMARY KEY (day, code)
+        )
+    """)
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS trending (
+            rank_no INTEGER NOT NULL PRIMARY KEY,
+            code VARCHAR(32) NOT NULL,
+            searched INTEGER DEFAULT 0,
+            viewed INTEGER DEFAULT 0,
+            episodes INTEGER DEFAULT 0,
+            computed_at DATETIME
+        )
+    """)
+
+
+# === 7: FSM holatlari (bir nechta jarayon uchun umumiy) ===
+async def _v7_fsm_states(cur):
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            chat BIGINT NOT NULL,
+            user BIGINT NOT NULL,
+            state VARCHAR(255),
+            data TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (chat, user),
+            INDEX idx_fsm_states_updated_at (updated_at)
+        )
+    """)
+
+
+# === 8: jarayonlar orasida umumiy holat: adminlar va katalog versiyasi ===
+async def _v8_shared_state(cur):
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS admins (
+            user_id BIGINT PRIMARY KEY,
+            added_by BIGINT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS catalog_state (
+            id TINYINT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+    await cur.execute("INSERT IGNORE INTO catalog_state (id, version) VALUES (1, 0)")
+
+
+# === 9: foydalanuvchi holati (faol / bloklagan / o‘chgan) va oxirgi faollik ===
+async def _v9_user_status(cur):
+    if not await _column_exists(cur, "users", "status"):
+        await cur.execute("ALTER TABLE users ADD COLUMN status TINYINT NOT NULL DEFAULT 0")
+    if not await _column_exists(cur, "users", "last_seen"):
+        await cur.execute("ALTER TABLE users ADD COLUMN last_seen DATE")
+    # Broadcast va sanoq faqat faollarni (status = 0) indeks bo‘yicha o‘qiydi
+    if not await _index_exists(cur, "users", "idx_users_status"):
+        await cur.execute("CREATE INDEX idx_users_status ON users (status, user_id)")
+
+
+# === 10: qism tugmalari uchun manba kanallarning qisqa indekslari ===
+async def _v10_source_channels(cur):
+    await cur.execute("""
+        CREATE TABLE IF NOT EXISTS source_channels (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            channel VARCHAR(64) NOT NULL,
+            UNIQUE KEY uq_source_channels_channel (channel)
+        )
+    """)
+
+
+# Yangi migratsiya faqat ro‘yxat oxiriga qo‘shiladi, eskilari o‘zgartirilmaydi
+MIGRATIONS = [
+    (1, _v1_initial),
+    (2, _v2_code_keys),
+    (3, _v3_publish_jobs),
+    (4, _v4_code_num),
+    (5, _v5_stats_viewed),
+    (6, _v6_usage_rollups),
+    (7, _v7_fsm_states),
+    (8, _v8_shared_state),
+    (9, _v9_user_status),
+    (10, _v10_source_channels),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def get_schema_version(cur):
+    try:
+        await cur.execute("SELECT MAX(version) FROM schema_version")
+    except aiomysql.ProgrammingError:
+        # Jadval hali yo‘q — birinchi ishga tushish yoki eski baza
+        await cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        return 0
+    (version,) = await cur.fetchone()
+    return version or 0
+
+
+# === Migratsiyalarni qo‘llash ===
+# Odatiy ishga tushishda faqat bitta SELECT bajariladi.
+async def migrate(pool):
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            version = await get_schema_version(cur)
+            if version >= LATEST_VERSION:
+                return version
+
+            await cur.execute("SELECT GET_LOCK(%s, 60)", (LOCK_NAME,))
+            try:
+                version = await get_schema_version(cur)
+                for target, step in MIGRATIONS:
+                    if target <= version:
+                        continue
+                    print(f"🛠 Migratsiya {target} qo‘llanmoqda...")
+                    await step(cur)
+                    await cur.execute(
+                        "INSERT INTO schema_version (version) VALUES (%s)", (target,)
+                    )
+                    version = target
+            finally:
+                await cur.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+    return version
+
+
+# Mahalliy MySQL da tekshirish uchun: python migrations.py
+if __name__ == "__main__":
+    import asyncio
+    import database
+
+    async def _main():
+        await database.init_db()
+        async with database.db_pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                print(f"✅ Sxema versiyasi: {await get_schema_version(cur)}")
+        database.db_pool.close()
+        await database.db_pool.wait_closed()
+
+    asyncio.run(_main())
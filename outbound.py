@@ -0,0 +1,228 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from aiogram.utils.exceptions import RetryAfter, BotBlocked, ChatNotFound, UserDeactivated
+from cache import TTLCache
+from database import USER_BLOCKED, USER_GONE
+from metrics import MeteredBot, Counter, Gauge, Histogram
+from ratelimit import TokenBucket
+
+# === Ustuvorlik sinflari (kichik son — oldinroq) ===
+INTERACTIVE = 0
+ADMIN = 1
+BULK = 2
+PRIORITY_NAMES = ("interactive", "admin", "bulk")
+
+# Joriy vazifa (va undan yaratilgan vazifalar) yuboradigan xabarlar sinfi
+current_priority = contextvars.ContextVar("outbound_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    token = current_priority.set(level)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+# Xabar yuboruvchi (Telegram limitlari qo‘llanadigan) metodlar
+SEND_METHODS = {
+    "sendMessage", "forwardMessage", "forwardMessages", "copyMessage", "copyMessages",
+    "sendPhoto", "sendVideo", "sendDocument", "sendAnimation", "sendAudio", "sendMediaGroup",
+    "editMessageText", "editMessageCaption", "editMessageReplyMarkup", "editMessageMedia",
+}
+
+outbound_wait_seconds = Histogram(
+    "bot_outbound_wait_seconds", "Yuborishdan oldin navbatda kutish vaqti", ("priority",)
+)
+outbound_queue_depth = Gauge("bot_outbound_queue_depth", "Navbatdagi yuborishlar", ("priority",))
+outbound_retry_after = Counter("bot_outbound_retry_after_total", "RetryAfter (flood wait) javoblari", ("priority",))
+
+
+# === Chiquvchi xabarlar rejalashtiruvchisi ===
+# Har bir yuborish avval o‘z chatining token bucket idan (FIFO), keyin umumiy
+# bucketdan ustuvorlik tartibida ruxsat oladi: umumiy limitga yetganda
+# interaktiv javoblar ommaviy yuborishlardan oldin o‘tadi. RetryAfter shu
+# yerda ushlanadi — chat to‘xtatiladi va so‘rov qayta navbatga qo‘yiladi;
+# ommaviy yuborishda esa butun BULK sinfi ham to‘xtatiladi (boshqa chatlarga
+# ham yuborishda davom etib, API ni bosib qo‘ymaslik uchun).
+class OutboundScheduler:
+    def __init__(self, rate=30, burst=None, chat_rate=1.0, chat_burst=5, max_retries=3):
+        self.rate = rate
+        self.burst = burst or rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0
+        self._level_paused_until = [0] * len(PRIORITY_NAMES)
+        self._heap = []
+        self._depth = [0] * len(PRIORITY_NAMES)
+        self._seq = itertools.count()
+        self._wakeup = None
+        self._task = None
+        # Faol bo‘lmagan chatlar bucketlari vaqt o‘tib tashlanadi
+        self._chats = TTLCache(maxsize=100000, ttl=120)
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for *_, future in self._heap:
+            if not future.done():
+                future.cancel()
+        self._heap = []
+
+    def stats(self):
+        return {
+            "queued": dict(zip(PRIORITY_NAMES, self._depth)),
+            "tokens": round(self._tokens, 1),
+            "paused": max(0.0, round(self._paused_until - time.monotonic(), 1)),
+            "bulk_paused": max(0.0, round(self._level_paused_until[BULK] - time.monotonic(), 1)),
+            "chats": len(self._chats)
+        }
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+        # Har foydalanishda muddati yangilanadi
+        self._chats.set(chat_id, bucket)
+        return bucket
+
+    def _set_depth(self, level, delta):
+        self._depth[level] += delta
+        outbound_queue_depth.set(self._depth[level], PRIORITY_NAMES[level])
+
+    async def acquire(self, chat_id, level, cost=1):
+        started = time.perf_counter()
+        if chat_id is not None:
+            await self._chat_bucket(chat_id).acquire(cost)
+        if self._task is None:
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (level, next(self._seq), min(cost, self.burst), future))
+        self._set_depth(level, 1)
+        self._wakeup.set()
+        try:
+            await future
+        finally:
+            self._set_depth(level, -1)
+            outbound_wait_seconds.observe(time.perf_counter() - started, PRIORITY_NAMES[level])
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            level, _, cost, future = self._heap[0]
+            if future.done():
+                heapq.heappop(self._heap)
+                continue
+            now = time.monotonic()
+            # Navbat boshida to‘xtatilgan sinf bo‘lsa — undan ustunroq so‘rov
+            # kelguncha (wakeup) yoki to‘xtash tugaguncha kutiladi
+            paused_until = max(self._paused_until, self._level_paused_until[level])
+            if now < paused_until:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), paused_until - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < cost:
+                await asyncio.sleep((cost - self._tokens) / self.rate)
+                continue
+            self._tokens -= cost
+            heapq.heappop(self._heap)
+            future.set_result(None)
+
+    def pause(self, chat_id, seconds):
+        if chat_id is None:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        else:
+            self._chat_bucket(chat_id).pause(seconds)
+
+    def pause_level(self, level, seconds):
+        self._level_paused_until[level] = max(self._level_paused_until[level], time.monotonic() + seconds)
+
+    async def call(self, chat_id, cost, request):
+        level = current_priority.get()
+        attempt = 0
+        while True:
+            await self.acquire(chat_id, level, cost)
+            try:
+                return await request()
+            except RetryAfter as e:
+                outbound_retry_after.inc(PRIORITY_NAMES[level])
+                attempt += 1
+                if level == BULK:
+                    self.pause_level(BULK, e.timeout)
+                if attempt > self.max_retries:
+                    raise
+                self.pause(chat_id, e.timeout)
+
+
+# Foydalanuvchiga endi yetib bo‘lmaydi: (xato turi, users.status)
+UNDELIVERABLE_ERRORS = ((BotBlocked, USER_BLOCKED), (UserDeactivated, USER_GONE), (ChatNotFound, USER_GONE))
+# "chat not found" manba (from_chat_id) noto‘g‘ri bo‘lganda ham qaytadi — bunday
+# metodlarda bu xato qabul qiluvchiga tegishli ekanini bilib bo‘lmaydi
+SOURCE_AMBIGUOUS_ERRORS = (ChatNotFound,)
+
+
+# === Yuborishlarni rejalashtiruvchi orqali o‘tkazadigan Bot ===
+# undeliverable(user_id, status) — shaxsiy chatga yuborib bo‘lmaganda chaqiriladi
+class ScheduledBot(MeteredBot):
+    scheduler = None
+    undeliverable = None
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        parent = super().request
+        if method not in SEND_METHODS:
+            return await parent(method, data, files, **kwargs)
+        data = data or {}
+        try:
+            if self.scheduler is None:
+                return await parent(method, data, files, **kwargs)
+            cost = 1
+            if method in ("copyMessages", "forwardMessages"):
+                cost = max(1, str(data.get("message_ids", "")).count(",") + 1)
+            return await self.scheduler.call(
+                data.get("chat_id"), cost, lambda: parent(method, data, files, **kwargs)
+            )
+        except Exception as e:
+            self._check_undeliverable(data, e)
+            raise
+
+    def _check_undeliverable(self, data, error):
+        if self.undeliverable is None:
+            return
+        if "from_chat_id" in data and isinstance(error, SOURCE_AMBIGUOUS_ERRORS):
+            return
+        try:
+            user_id = int(data.get("chat_id"))
+        except (TypeError, ValueError):
+            return
+        if user_id <= 0:
+            return
+        for error_type, status in UNDELIVERABLE_ERRORS:
+            if isinstance(error, error_type):
+                self.undeliverable(user_id, status)
+                return
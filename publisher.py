@@ -0,0 +1,113 @@
+import asyncio
+import aiohttp
+from aiogram.utils.exceptions import NetworkError
+from ratelimit import TokenBucket
+from outbound import current_priority, BULK
+from database import save_publish_jobs, set_publish_status, get_publish_jobs
+
+# Vaqtinchalik xatolar (qayta urinib ko‘riladi)
+TRANSIENT_ERRORS = (NetworkError, aiohttp.ClientError, asyncio.TimeoutError)
+
+
+# === Kanallarga nashr qilish navbati ===
+# Har bir (kod, kanal) alohida vazifa: ishchilar ularni bir vaqtda bajaradi,
+# har bir kanal o‘z token bucket i bilan cheklanadi (RetryAfter ni outbound
+# rejalashtiruvchisi qayta urinadi, bu yerga yetsa — xato). Vaqtinchalik xatolar
+# eksponensial kutish bilan qayta uriniladi, natija publish_jobs jadvaliga
+# yoziladi — shuning uchun keyin faqat muvaffaqiyatsizlari qayta yuboriladi.
+class Publisher:
+    def __init__(self, bot, make_markup, concurrency=10, chat_rate=20 / 60, chat_burst=20,
+                 max_attempts=5, base_delay=1.0):
+        self.bot = bot
+        self.make_markup = make_markup
+        self.concurrency = concurrency
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self._queue = asyncio.Queue()
+        self._buckets = {}
+        self._workers = []
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def _bucket(self, chat):
+        bucket = self._buckets.get(chat)
+        if bucket is None:
+            bucket = self._buckets[chat] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    # jobs: [(code, channel, from_chat, message_id), ...]
+    # Natija: [(job, xato yoki None), ...] — hammasi tugaguncha kutiladi
+    async def publish(self, jobs):
+        await save_publish_jobs(jobs)
+        loop = asyncio.get_running_loop()
+        futures = []
+        for job in jobs:
+            future = loop.create_future()
+            futures.append(future)
+            self._queue.put_nowait((job, 0, future))
+        errors = await asyncio.gather(*futures)
+        return list(zip(jobs, errors))
+
+    # Ishga tushishda tugallanmay qolgan vazifalarni navbatga qaytarish
+    async def resume(self):
+        for row in await get_publish_jobs("pending"):
+            job = (row["code"], row["channel"], row["from_chat"], row["message_id"])
+            self._queue.put_nowait((job, 0, None))
+
+    async def retry_failed(self):
+        rows = await get_publish_jobs("failed")
+        return await self.publish([
+            (row["code"], row["channel"], row["from_chat"], row["message_id"]) for row in rows
+        ])
+
+    async def _worker(self):
+        current_priority.set(BULK)
+        while True:
+            job, attempt, future = await self._queue.get()
+            try:
+                await self._process(job, attempt, future)
+            except Exception as e:
+                print(f"❌ Nashr ishchisida xatolik: {job} -> {e}")
+                if future is not None and not future.done():
+                    future.set_result(str(e))
+            finally:
+                self._queue.task_done()
+
+    def _retry_later(self, job, attempt, future, delay):
+        asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, (job, attempt, future))
+
+    async def _process(self, job, attempt, future):
+        code, channel, from_chat, message_id = job
+        await self._bucket(channel).acquire()
+        attempt += 1
+        try:
+            await self.bot.copy_message(
+                chat_id=channel,
+                from_chat_id=from_chat,
+                message_id=message_id,
+                reply_markup=self.make_markup(code)
+            )
+        except TRANSIENT_ERRORS as e:
+            if attempt < self.max_attempts:
+                await set_publish_status(code, channel, "pending", attempt, str(e))
+                self._retry_later(job, attempt, future, self.base_delay * 2 ** (attempt - 1))
+                return
+            error = str(e)
+        except Exception as e:
+            error = str(e)
+        else:
+            error = None
+
+        await set_publish_status(code, channel, "failed" if error else "done", attempt, error)
+        if future is not None:
+            future.set_result(error)
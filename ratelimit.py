@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+
+# === Token bucket ===
+# Soniyasiga `rate` ta ruxsat, `capacity` gacha to‘planadi. pause() flood-wait
+# (RetryAfter) paytida barcha kutayotganlarni to‘xtatib turadi.
+# acquire(n) bir so‘rovda n ta xabar yuboriladigan holatlar uchun (capacity dan oshmaydi).
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens=1):
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
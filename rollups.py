@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+from background import PeriodicFlusher
+from counters import current_hour
+from database import rollup_hourly_stats, refresh_trending
+
+
+# === Foydalanuvchi faolligi rollup lari ===
+# Har `interval` soniyada: eski soatlik yozuvlar kunlik jadvalga ko‘chiriladi,
+# muddati o‘tgan kunlik yozuvlar o‘chiriladi va oxirgi 24 soatlik trend
+# reytingi oldindan hisoblab qo‘yiladi (admin ko‘rinishi tayyor jadvalni o‘qiydi).
+class UsageRollup(PeriodicFlusher):
+    flush_on_stop = False
+
+    def __init__(self, interval=600, hourly_retention_hours=48, daily_retention_days=90,
+                 trending_hours=24):
+        super().__init__(interval)
+        self.hourly_retention_hours = hourly_retention_hours
+        self.daily_retention_days = daily_retention_days
+        self.trending_hours = trending_hours
+
+    async def flush(self):
+        hour = current_hour()
+        await rollup_hourly_stats(
+            hour - timedelta(hours=self.hourly_retention_hours),
+            (hour - timedelta(days=self.daily_retention_days)).date()
+        )
+        # Joriy soat ham kiradi: [hour - 23, hour]
+        await refresh_trending(hour - timedelta(hours=self.trending_hours - 1), datetime.utcnow())
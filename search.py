@@ -0,0 +1,116 @@
+import heapq
+import re
+from collections import Counter, defaultdict
+from itertools import chain
+
+# Kirill harflarini lotinga o‘girish (o‘zbek va rus alifbolari)
+CYRILLIC_TO_LATIN = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo",
+    "ж": "j", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "x", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "",
+    "ы": "i", "ь": "", "э": "e", "ю": "yu", "я": "ya", "ў": "o", "қ": "q",
+    "ғ": "g", "ҳ": "h",
+}
+_TRANSLATE = str.maketrans({
+    **CYRILLIC_TO_LATIN,
+    "‘": "", "’": "", "ʻ": "", "ʼ": "", "`": "", "'": "",
+})
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+# Shundan past ball olgan natijalar ko‘rsatilmaydi
+MIN_SCORE = 0.3
+# Aniq ball faqat eng ko‘p umumiy trigramga ega shuncha nomzod uchun hisoblanadi
+MAX_CANDIDATES = 200
+
+
+def normalize(text):
+    text = text.lower().translate(_TRANSLATE)
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def trigrams(text):
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+# === Nomlar bo‘yicha trigram indeks ===
+# Har bir trigram uchun shu trigram uchraydigan kodlar to‘plami saqlanadi.
+# Qidiruvda faqat so‘rov trigramlari postinglari sanaladi (to‘liq skan yo‘q),
+# eng ko‘p mos kelgan nomzodlar Dice koeffitsienti (+ to‘liq moslik uchun
+# bonus) bo‘yicha saralanadi.
+class SearchIndex:
+    def __init__(self):
+        self._titles = {}
+        self._postings = defaultdict(set)
+
+    def __len__(self):
+        return len(self._titles)
+
+    def load(self, rows):
+        self._titles.clear()
+        self._postings.clear()
+        for row in rows:
+            self.add(row["code"], row["title"])
+
+    def add(self, code, title):
+        self.remove(code)
+        if not title:
+            return
+        normalized = normalize(title)
+        grams = trigrams(normalized)
+        self._titles[code] = (title, normalized, grams)
+        for gram in grams:
+            self._postings[gram].add(code)
+
+    def remove(self, code):
+        entry = self._titles.pop(code, None)
+        if entry is None:
+            return False
+        for gram in entry[2]:
+            codes = self._postings.get(gram)
+            if codes is not None:
+                codes.discard(code)
+                if not codes:
+                    del self._postings[gram]
+        return True
+
+    def search(self, query, limit=10):
+        normalized = normalize(query)
+        if not normalized:
+            return []
+        grams = trigrams(normalized)
+
+        common = Counter(chain.from_iterable(self._postings.get(gram, ()) for gram in grams))
+
+        scored = []
+        for code, count in common.most_common(max(MAX_CANDIDATES, limit)):
+            _, title_normalized, title_grams = self._titles[code]
+            score = 2 * count / (len(grams) + len(title_grams))
+            if normalized in title_normalized:
+                score += 1.0
+            if score >= MIN_SCORE:
+                scored.append((score, code))
+
+        return [
+            {"code": code, "title": self._titles[code][0]}
+            for _, code in heapq.nlargest(limit, scored)
+        ]
+
+
+index = SearchIndex()
+
+
+# Yangi indeksni alohida qurish (masalan, asyncio.to_thread da) — keyin almashtiriladi
+def build_index(rows):
+    new_index = SearchIndex()
+    new_index.load(rows)
+    return new_index
+
+
+async def anime_search(query, limit=10):
+    return index.search(query, limit)
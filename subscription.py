@@ -0,0 +1,54 @@
+import asyncio
+from cache import TTLCache
+
+SUBSCRIBED_STATUSES = ("member", "administrator", "creator")
+LEFT_STATUSES = ("left", "kicked")
+
+
+# === Obuna holati ombori ===
+# Faqat ijobiy natija (barcha kanallarga obuna) qisqa muddatga keshlanadi,
+# kanallar bir vaqtda tekshiriladi, chat_member yangilanishlari esa
+# kanaldan chiqqan foydalanuvchini keshdan o‘chiradi.
+class SubscriptionStore:
+    def __init__(self, bot, channels, ttl=300, maxsize=100000):
+        self.bot = bot
+        self.channels = [ch.strip() for ch in channels if ch.strip()]
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def _get_status(self, channel, user_id):
+        try:
+            member = await self.bot.get_chat_member(channel, user_id)
+            return member.status
+        except Exception as e:
+            print(f"❗ Obuna tekshirishda xatolik: {channel} -> {e}")
+            return None
+
+    # Har bir kanal uchun holat: {kanal: status yoki None (xatolik)}
+    async def check(self, user_id):
+        statuses = await asyncio.gather(
+            *(self._get_status(channel, user_id) for channel in self.channels)
+        )
+        result = dict(zip(self.channels, statuses))
+        if all(status in SUBSCRIBED_STATUSES for status in statuses):
+            self._cache.set(user_id, True)
+        else:
+            self._cache.invalidate(user_id)
+        return result
+
+    async def is_subscribed(self, user_id):
+        if self._cache.get(user_id):
+            return True
+        result = await self.check(user_id)
+        return all(status in SUBSCRIBED_STATUSES for status in result.values())
+
+    def invalidate(self, user_id):
+        self._cache.invalidate(user_id)
+
+    # chat_member yangilanishi: foydalanuvchi chiqsa yoki haydalsa kesh tozalanadi
+    def on_member_update(self, update):
+        member = update.new_chat_member
+        if member.status not in SUBSCRIBED_STATUSES:
+            self.invalidate(member.user.id)
+
+    def stats(self):
+        return self._cache.stats()
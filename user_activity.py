@@ -0,0 +1,68 @@
+from datetime import date
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from background import PeriodicFlusher
+from database import touch_users_batch, set_users_status_batch, USER_ACTIVE
+
+
+# === Foydalanuvchi faolligi va yetkazib bo‘lmaydiganlar (write-behind) ===
+# Har bir foydalanuvchi uchun oxirgi hodisa xotirada saqlanadi: yangilanish
+# kelsa — faol (kuniga bir marta yoziladi), "bot was blocked" / "chat not
+# found" bo‘lsa — tegishli status. Davriy ravishda ko‘p qatorli upsert bilan yoziladi.
+class UserActivity(PeriodicFlusher):
+    def __init__(self, interval=10, max_pending=5000):
+        super().__init__(interval)
+        self.max_pending = max_pending
+        self._pending = {}
+        self._day = None
+        self._seen_today = set()
+
+    def seen(self, user_id):
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._seen_today = set()
+        if user_id in self._seen_today:
+            return
+        self._seen_today.add(user_id)
+        self._set(user_id, (USER_ACTIVE, today))
+
+    def undeliverable(self, user_id, status):
+        # Keyingi yangilanishda qayta faol deb yozilishi uchun
+        self._seen_today.discard(user_id)
+        self._set(user_id, (status, None))
+
+    def _set(self, user_id, event):
+        self._pending[user_id] = event
+        if len(self._pending) >= self.max_pending:
+            self.wake()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            await touch_users_batch([
+                (user_id, day) for user_id, (status, day) in pending.items() if status == USER_ACTIVE
+            ])
+            await set_users_status_batch([
+                (user_id, status) for user_id, (status, _) in pending.items() if status != USER_ACTIVE
+            ])
+        except Exception:
+            # Yangiroq hodisalar ustun
+            for user_id, event in pending.items():
+                self._pending.setdefault(user_id, event)
+            raise
+
+
+# Xabar yoki tugma bosilishi — foydalanuvchi faol
+class ActivityMiddleware(BaseMiddleware):
+    def __init__(self, activity):
+        super().__init__()
+        self.activity = activity
+
+    async def on_pre_process_message(self, message, data):
+        if message.from_user and message.chat.type == "private":
+            self.activity.seen(message.from_user.id)
+
+    async def on_pre_process_callback_query(self, callback, data):
+        self.activity.seen(callback.from_user.id)
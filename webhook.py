@@ -0,0 +1,76 @@
+import asyncio
+import hmac
+from aiohttp import web
+from aiogram import Bot, Dispatcher, types
+from keep_alive import create_app
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+# === Webhook qabul qiluvchi ===
+# Yangilanish darhol 200 bilan tasdiqlanadi va fon vazifasida qayta ishlanadi;
+# bir vaqtda ishlanadigan yangilanishlar soni semafor bilan cheklanadi.
+# Secret sarlavhasi har doim tekshiriladi: secret berilmagan bo‘lsa barcha
+# so‘rovlar rad etiladi (soxta admin yangilanishlaridan himoya).
+class WebhookHandler:
+    def __init__(self, dp, secret=None, concurrency=50):
+        self.dp = dp
+        self.secret = secret
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+
+    async def __call__(self, request):
+        if not self.secret or not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), self.secret
+        ):
+            return web.Response(status=401)
+        try:
+            update = types.Update(**await request.json())
+        except ValueError:
+            return web.Response(status=400)
+
+        Bot.set_current(self.dp.bot)
+        Dispatcher.set_current(self.dp)
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update):
+        async with self._semaphore:
+            try:
+                await self.dp.process_update(update)
+            except Exception as e:
+                print(f"❌ Yangilanishni qayta ishlashda xatolik: {update.update_id} -> {e}")
+
+    async def wait_closed(self):
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# === Webhook rejimi: bitta aiohttp ilova (webhook + health) ===
+def run_webhook(dp, webhook_url, path, on_startup, on_shutdown, secret=None,
+                concurrency=50, allowed_updates=None, host='0.0.0.0', port=8080):
+    handler = WebhookHandler(dp, secret=secret, concurrency=concurrency)
+    app = create_app()
+    app.router.add_post(path, handler)
+
+    async def startup(app):
+        await on_startup(dp)
+        await dp.bot.set_webhook(
+            webhook_url + path,
+            secret_token=secret,
+            allowed_updates=allowed_updates,
+            drop_pending_updates=True
+        )
+
+    async def shutdown(app):
+        await handler.wait_closed()
+        await on_shutdown(dp)
+        await dp.storage.close()
+        await dp.storage.wait_closed()
+        session = await dp.bot.get_session()
+        await session.close()
+
+    app.on_startup.append(startup)
+    app.on_shutdown.append(shutdown)
+    web.run_app(app, host=host, port=port)
@@ -0,0 +1,212 @@
+import asyncio
+import hmac
+import multiprocessing
+import signal
+from aiohttp import web
+from aiogram import Bot, Dispatcher, types
+from aiogram.bot import api
+from aiogram.utils.payload import generate_payload, prepare_arg
+from keep_alive import create_app, keep_alive
+from webhook import SECRET_HEADER
+
+
+# === Yangilanish egasi ===
+# Bitta foydalanuvchining barcha yangilanishlari bitta workerga tushishi va
+# ketma-ket ishlanishi uchun kalit. chat_member da obuna holati o‘zgargan
+# foydalanuvchi (new_chat_member.user) olinadi — uning obuna keshi tozalanadi.
+def shard_key(update):
+    member_update = update.get("chat_member")
+    if member_update:
+        return member_update["new_chat_member"]["user"]["id"]
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        sender = value.get("from")
+        if sender:
+            return sender["id"]
+        chat = value.get("chat")
+        if chat:
+            return chat["id"]
+    return 0
+
+
+# === Worker ichida: foydalanuvchi bo‘yicha tartibli qayta ishlash ===
+# Turli foydalanuvchilar parallel (semafor bilan cheklangan), bitta
+# foydalanuvchi yangilanishlari esa kelgan tartibida birma-bir ishlanadi.
+class OrderedProcessor:
+    def __init__(self, dp, concurrency=50):
+        self.dp = dp
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._locks = {}
+        self._tasks = set()
+
+    def submit(self, data):
+        task = asyncio.create_task(self._process(shard_key(data), types.Update(**data)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, key, update):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self._semaphore:
+                await self.dp.process_update(update)
+        except Exception as e:
+            print(f"❌ Yangilanishni qayta ishlashda xatolik: {update.update_id} -> {e}")
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def wait_closed(self):
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def _worker_loop(dp, index, count, queue, on_startup, on_shutdown, concurrency):
+    Bot.set_current(dp.bot)
+    Dispatcher.set_current(dp)
+    await on_startup(dp, (index, count))
+    print(f"✅ Worker {index}/{count} ishga tushdi")
+
+    processor = OrderedProcessor(dp, concurrency)
+    loop = asyncio.get_running_loop()
+    while True:
+        data = await loop.run_in_executor(None, queue.get)
+        if data is None:
+            break
+        processor.submit(data)
+
+    await processor.wait_closed()
+    await on_shutdown(dp)
+    await dp.storage.close()
+    await dp.storage.wait_closed()
+    session = await dp.bot.get_session()
+    await session.close()
+
+
+def _worker_main(dp, index, count, queue, on_startup, on_shutdown, concurrency):
+    # Ctrl+C ni front ushlaydi va navbatga to‘xtash belgisini (None) qo‘yadi —
+    # worker qo‘lidagi yangilanishlarni tugatib, bufferlarni yozib chiqadi
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker_loop(dp, index, count, queue, on_startup, on_shutdown, concurrency))
+
+
+# === Front jarayon: worker processlar va yangilanishlarni taqsimlash ===
+# Workerlar fork bilan yaratiladi (handlerlar ro‘yxatdan o‘tgan dp meros
+# qoladi), shuning uchun front hali event loop ishga tushirmasdan start()
+# qilinishi kerak. Har bir worker o‘z navbatiga ega: user_id % count.
+class WorkerPool:
+    def __init__(self, dp, count, on_startup, on_shutdown, concurrency=50):
+        self.dp = dp
+        self.count = count
+        self.on_startup = on_startup
+        self.on_shutdown = on_shutdown
+        self.concurrency = concurrency
+        self._queues = []
+        self._processes = []
+
+    def start(self):
+        context = multiprocessing.get_context("fork")
+        for index in range(self.count):
+            queue = context.Queue()
+            process = context.Process(
+                target=_worker_main,
+                args=(self.dp, index, self.count, queue,
+                      self.on_startup, self.on_shutdown, self.concurrency),
+                name=f"bot-worker-{index}"
+            )
+            process.start()
+            self._queues.append(queue)
+            self._processes.append(process)
+
+    def dispatch(self, data):
+        self._queues[shard_key(data) % self.count].put(data)
+
+    async def stop(self):
+        for queue in self._queues:
+            queue.put(None)
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join)
+
+
+# Front long polling: yangilanishlar xom JSON holida olinadi (front ularni
+# parse qilmaydi, faqat kalitini o‘qib navbatga qo‘yadi)
+# skip_updates: bitta jarayonli rejimdagidek to‘xtab turgan paytdagi yangilanishlar tashlanadi
+async def _poll(bot, pool, allowed_updates, timeout=20, skip_updates=True):
+    await bot.delete_webhook(drop_pending_updates=skip_updates)
+    allowed_updates = prepare_arg(allowed_updates)
+    offset = None
+    while True:
+        try:
+            updates = await bot.request(api.Methods.GET_UPDATES, generate_payload(
+                offset=offset, timeout=timeout, allowed_updates=allowed_updates
+            ))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ getUpdates xatosi: {e}")
+            await asyncio.sleep(1)
+            continue
+        for data in updates:
+            pool.dispatch(data)
+            offset = data["update_id"] + 1
+
+
+# === Worker rejimi: polling ===
+def run_polling_workers(pool, allowed_updates=None, port=8080, skip_updates=True):
+    pool.start()
+    bot = pool.dp.bot
+
+    async def main():
+        runner = await keep_alive(port=port)
+        try:
+            await _poll(bot, pool, allowed_updates, skip_updates=skip_updates)
+        finally:
+            await pool.stop()
+            await runner.cleanup()
+            session = await bot.get_session()
+            await session.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+# === Worker rejimi: webhook ===
+def run_webhook_workers(pool, webhook_url, path, secret=None, allowed_updates=None,
+                        host='0.0.0.0', port=8080):
+    pool.start()
+    bot = pool.dp.bot
+
+    async def handle(request):
+        if not secret or not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret):
+            return web.Response(status=401)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        pool.dispatch(data)
+        return web.Response()
+
+    async def startup(app):
+        await bot.set_webhook(
+            webhook_url + path,
+            secret_token=secret,
+            allowed_updates=allowed_updates,
+            drop_pending_updates=True
+        )
+
+    async def shutdown(app):
+        await pool.stop()
+        session = await bot.get_session()
+        await session.close()
+
+    app = create_app()
+    app.router.add_post(path, handle)
+    app.on_startup.append(startup)
+    app.on_shutdown.append(shutdown)
+    web.run_app(app, host=host, port=port)